@@ -0,0 +1,207 @@
+"""Seeded synthetic data for the benchmark suite.
+
+The same scale and seed always produce the same rows, so runs against
+different commits measure the code rather than the data.
+"""
+import random
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, select, text
+
+from models import (
+    db, article_tags, Article, Bookmark, Category, ClickRollup, Comment, ShortUrl,
+    Tag, Todo, User,
+)
+from passwords import hasher
+from shortcodes import allocator
+
+PASSWORD = "benchmark"
+BATCH_SIZE = 1000
+EPOCH = datetime(2026, 1, 1)
+
+SCALES = {
+    "tiny": {
+        "users": 3, "categories": 3, "tags": 10, "articles": 20, "tags_per_article": 3,
+        "comments_per_article": 10, "comment_depth": 5, "todos_per_user": 10,
+        "bookmarks_per_user": 10, "short_urls_per_user": 5, "rollups_per_url": 3,
+    },
+    "small": {
+        "users": 50, "categories": 10, "tags": 200, "articles": 2000, "tags_per_article": 4,
+        "comments_per_article": 20, "comment_depth": 12, "todos_per_user": 200,
+        "bookmarks_per_user": 200, "short_urls_per_user": 100, "rollups_per_url": 24,
+    },
+    "large": {
+        "users": 500, "categories": 25, "tags": 2000, "articles": 50000,
+        "tags_per_article": 5, "comments_per_article": 40, "comment_depth": 30,
+        "todos_per_user": 1000, "bookmarks_per_user": 1000, "short_urls_per_user": 500,
+        "rollups_per_url": 72,
+    },
+}
+
+WORDS = (
+    "python flask database index query cache latency throughput thread process "
+    "pool kernel network socket packet buffer memory page disk queue lock "
+    "leader manager team strategy roadmap hiring review feedback meeting "
+    "model training dataset gradient tensor vector search ranking feature"
+).split()
+REFERRERS = ["", "news.ycombinator.com", "twitter.com", "google.com", "reddit.com"]
+AGENTS = ["chrome", "firefox", "safari", "bot", "curl"]
+
+
+def username(n):
+    return f"user{n}"
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(target, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(target), rows[start:start + BATCH_SIZE])
+
+
+def _reset_sequences():
+    # Rows are inserted with explicit ids; move Postgres sequences past them.
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in (User, Category, Tag, Article, Comment, Todo, Bookmark, ShortUrl,
+                  ClickRollup):
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM \"{table}\"), false)"
+        ))
+
+
+def generate(scale, seed=0):
+    """Fill the (empty) database with ``scale`` rows; return the row counts.
+
+    ``scale`` is one of ``SCALES`` or a dict with the same keys. Must run in
+    an app context.
+    """
+    counts = dict(SCALES[scale]) if isinstance(scale, str) else dict(scale)
+    rng = random.Random(seed)
+    if db.session.scalar(select(func.count()).select_from(User)):
+        raise RuntimeError("Benchmark data must be generated into an empty database.")
+
+    # Codes come from the allocator's own transactions; take them all before
+    # this session starts writing so SQLite never has two writers.
+    length = current_app.config["SHORT_CODE_LENGTH"]
+    codes = [
+        allocator.allocate(length)
+        for _ in range(counts["users"] * counts["short_urls_per_user"])
+    ]
+    password_hash = hasher.hash(PASSWORD)
+    users = [
+        {"id": n + 1, "username": username(n), "password_hash": password_hash,
+         "full_name": f"User {n}", "email": f"{username(n)}@example.com"}
+        for n in range(counts["users"])
+    ]
+    _insert(User, users)
+    _insert(Category, [{"id": n + 1, "name": f"category{n}"}
+                       for n in range(counts["categories"])])
+    _insert(Tag, [{"id": n + 1, "name": f"tag{n}"} for n in range(counts["tags"])])
+
+    articles, links = [], []
+    for n in range(counts["articles"]):
+        user = rng.choice(users)
+        articles.append({
+            "id": n + 1,
+            "title": _sentence(rng, 6),
+            "description": _sentence(rng, 60),
+            "author": user["username"],
+            "user_id": user["id"],
+            "category_id": rng.randint(1, counts["categories"]),
+        })
+        tags = rng.sample(range(1, counts["tags"] + 1),
+                          min(counts["tags_per_article"], counts["tags"]))
+        links.extend({"article_id": n + 1, "tag_id": t} for t in tags)
+    _insert(Article, articles)
+    _insert(article_tags, links)
+
+    # Each comment replies to the previous one (deepening the thread) until
+    # comment_depth is reached, and otherwise to a random earlier comment or
+    # the article itself.
+    comments = []
+    for article in articles:
+        thread = []
+        for _ in range(counts["comments_per_article"]):
+            parent, depth = None, 1
+            if thread and rng.random() < 0.6 and thread[-1][1] < counts["comment_depth"]:
+                parent, depth = thread[-1][0], thread[-1][1] + 1
+            elif thread and rng.random() < 0.5:
+                parent_id, parent_depth = rng.choice(thread)
+                if parent_depth < counts["comment_depth"]:
+                    parent, depth = parent_id, parent_depth + 1
+            user = rng.choice(users)
+            comment_id = len(comments) + 1
+            comments.append({
+                "id": comment_id,
+                "author": user["username"],
+                "description": _sentence(rng, 25),
+                "article_id": article["id"],
+                "user_id": user["id"],
+                "parent_id": parent,
+            })
+            thread.append((comment_id, depth))
+    _insert(Comment, comments)
+
+    todos, bookmarks = [], []
+    for user in users:
+        for _ in range(counts["todos_per_user"]):
+            todos.append({
+                "id": len(todos) + 1,
+                "title": _sentence(rng, 5),
+                "author": user["username"],
+                "done": rng.random() < 0.3,
+                "user_id": user["id"],
+            })
+        for n in range(counts["bookmarks_per_user"]):
+            bookmarks.append({
+                "id": len(bookmarks) + 1,
+                "url": f"https://example.com/{user['id']}/{n}",
+                "title": _sentence(rng, 4),
+                "description": _sentence(rng, 12),
+                "user_id": user["id"],
+                "created_at": EPOCH + timedelta(minutes=len(bookmarks)),
+            })
+    _insert(Todo, todos)
+    _insert(Bookmark, bookmarks)
+
+    short_urls, rollups = [], []
+    for user in users:
+        for _ in range(counts["short_urls_per_user"]):
+            url_id = len(short_urls) + 1
+            short_urls.append({
+                "id": url_id,
+                "short_code": codes[url_id - 1],
+                "original_url": f"https://example.com/long/{url_id}",
+                "user_id": user["id"],
+                "click_count": 0,
+                "created_at": EPOCH + timedelta(minutes=url_id),
+            })
+            for hour in range(counts["rollups_per_url"]):
+                clicks = rng.randint(1, 50)
+                short_urls[-1]["click_count"] += clicks
+                rollups.append({
+                    "id": len(rollups) + 1,
+                    "short_url_id": url_id,
+                    "granularity": "hour",
+                    "bucket": EPOCH + timedelta(hours=hour),
+                    "referrer": rng.choice(REFERRERS),
+                    "agent": rng.choice(AGENTS),
+                    "clicks": clicks,
+                })
+    _insert(ShortUrl, short_urls)
+    _insert(ClickRollup, rollups)
+
+    _reset_sequences()
+    db.session.commit()
+    return {
+        "users": len(users), "categories": counts["categories"], "tags": counts["tags"],
+        "articles": len(articles), "article_tags": len(links), "comments": len(comments),
+        "todos": len(todos), "bookmarks": len(bookmarks), "short_urls": len(short_urls),
+        "click_rollups": len(rollups),
+    }
@@ -0,0 +1,428 @@
+"""Latency and throughput benchmarks for every API endpoint.
+
+Seeds a fresh database with :mod:`benchmarks.datagen`, then drives each
+endpoint in-process through the Flask test client and writes the results
+as JSON::
+
+    python -m benchmarks.run --scale small --output bench_results.json
+    python -m benchmarks.run --scale small --baseline baseline.json
+    python -m benchmarks.run --compare bench_results.json --baseline baseline.json
+
+With ``--baseline`` the results are compared against an earlier run. The
+exit status is 1 if any endpoint regressed: its median or p95 latency grew
+by more than ``--threshold`` (and by at least ``--min-delta-ms``), or it
+issued more SQL queries than before. Since the data is seeded, query
+counts are exact and latencies are comparable on the same machine.
+
+By default the database is a temporary SQLite file. ``--database-url``
+points the run at another database (e.g. Postgres). Its tables are dropped
+and recreated, which ``--reset`` must confirm.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from benchmarks import datagen
+
+DEFAULT_ITERATIONS = 50
+DEFAULT_WARMUP = 5
+SLOW_ITERATIONS = 3  # for endpoints that hash a password
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 0.5
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+    """One endpoint call. ``prepare(ctx, i)``, if given, runs untimed before
+    each call and returns ``(path, json)`` for it. ``cold`` empties the
+    response cache untimed before each call, so a cached endpoint is
+    measured doing its queries rather than serving a hit."""
+
+    def __init__(self, name, method, path=None, json=None, prepare=None, status=200,
+                 iterations=None, client="user", cold=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.json = json
+        self.prepare = prepare
+        self.status = status
+        self.iterations = iterations
+        self.client = client
+        self.cold = cold
+
+    def request(self, ctx, i):
+        if self.prepare:
+            return self.prepare(ctx, i)
+        return self.path, self.json
+
+
+def _call(client, method, path, json=None, status=200):
+    resp = client.open(path, method=method, json=json)
+    if resp.status_code != status:
+        raise BenchmarkError(f"{method} {path} returned {resp.status_code}, expected {status}")
+    return resp.get_json(silent=True)
+
+
+def _login(client, username):
+    _call(client, "POST", "/api/login",
+          {"username": username, "password": datagen.PASSWORD})
+
+
+class _Context:
+    """Ids the scenarios need, looked up through the API once seeded."""
+
+    def __init__(self, app):
+        self.app = app
+        self.username = datagen.username(0)
+        self.user = app.test_client()
+        self.anon = app.test_client()
+        self.scraper = app.test_client()
+        self.scraper.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {app.config['METRICS_TOKEN']}"
+        _login(self.user, self.username)
+
+        first = _call(self.user, "GET", "/api/articles?limit=1")
+        self.article_id = first["articles"][0]["id"]
+        self.article_cursor = first["next_cursor"]
+        self.comment_id = _call(
+            self.user, "GET", f"/api/articles/{self.article_id}/comments?limit=1"
+        )["comments"][0]["id"]
+        self.category_id = _call(self.user, "GET", "/api/categories")["categories"][0]["id"]
+        short_url = _call(self.user, "GET", "/api/shortener?limit=1")["short_urls"][0]
+        self.short_url_id = short_url["id"]
+        self.short_code = short_url["short_code"]
+        self.own_article_id = _call(
+            self.user, "POST", "/api/articles",
+            {"title": "Benchmark article", "tags": "tag0, tag1"}, status=201,
+        )["article"]["id"]
+        self.todo_id = _call(
+            self.user, "POST", "/api/todos", {"title": "Benchmark todo"}, status=201
+        )["todo"]["id"]
+
+    def create(self, path, body, key):
+        return _call(self.user, "POST", path, body, status=201)[key]["id"]
+
+
+def _prime_feeds():
+    # Serve feeds from a fresh cache so the run never touches the network.
+    from routes import feeds
+
+    expires = time.time() + 86400
+    for sub in feeds.SUBREDDITS:
+        posts = [
+            {"title": f"{sub} {n}", "url": "https://example.com", "permalink": "",
+             "subreddit": sub, "author": "bench", "score": 1000 - n, "num_comments": n,
+             "created_utc": 1700000000, "thumbnail": "", "selftext": ""}
+            for n in range(15)
+        ]
+        feeds._cache.set(feeds._source_key(sub, "hot"), {"expires": expires, "posts": posts},
+                         86400)
+
+
+def scenarios():
+    def signup(ctx, i):
+        return "/api/signup", {"username": f"bench-signup-{time.time_ns()}",
+                               "password": datagen.PASSWORD}
+
+    def logout(ctx, i):
+        _login(ctx.anon, datagen.username(1))
+        return "/api/logout", None
+
+    def delete(path, body, key, url):
+        def prepare(ctx, i):
+            return url.format(id=ctx.create(path, body, key), ctx=ctx), None
+        return prepare
+
+    return [
+        Scenario("auth.me", "GET", "/api/me"),
+        Scenario("auth.profile_get", "GET", "/api/profile"),
+        Scenario("auth.profile_put", "PUT", prepare=lambda ctx, i: (
+            "/api/profile", {"username": ctx.username, "full_name": f"Bench {i}",
+                             "email": "bench@example.com"})),
+        Scenario("auth.login", "POST", "/api/login",
+                 {"username": datagen.username(1), "password": datagen.PASSWORD},
+                 iterations=SLOW_ITERATIONS, client="anon"),
+        Scenario("auth.signup", "POST", prepare=signup, status=201,
+                 iterations=SLOW_ITERATIONS, client="anon"),
+        Scenario("auth.logout", "POST", prepare=logout, iterations=SLOW_ITERATIONS,
+                 client="anon"),
+
+        Scenario("todos.index", "GET", "/api/todos"),
+        Scenario("todos.add", "POST", "/api/todos", {"title": "Benchmark todo"}, status=201),
+        Scenario("todos.toggle", "PATCH",
+                 prepare=lambda ctx, i: (f"/api/todos/{ctx.todo_id}/toggle", None)),
+        Scenario("todos.delete", "DELETE", prepare=delete(
+            "/api/todos", {"title": "Doomed"}, "todo", "/api/todos/{id}")),
+
+        Scenario("articles.list", "GET", "/api/articles", cold=True),
+        Scenario("articles.list_page_2", "GET", cold=True,
+                 prepare=lambda ctx, i: (f"/api/articles?cursor={ctx.article_cursor}", None)),
+        Scenario("articles.list_by_tag", "GET", "/api/articles?tag=tag0", cold=True),
+        Scenario("articles.list_by_category", "GET", cold=True, prepare=lambda ctx, i: (
+            f"/api/articles?category_id={ctx.category_id}", None)),
+        Scenario("articles.search", "GET", "/api/articles?q=latency+cache", cold=True),
+        Scenario("articles.detail", "GET", cold=True,
+                 prepare=lambda ctx, i: (f"/api/articles/{ctx.article_id}", None)),
+        # The same reads served from the response cache.
+        Scenario("articles.list_cache_hit", "GET", "/api/articles"),
+        Scenario("articles.detail_cache_hit", "GET",
+                 prepare=lambda ctx, i: (f"/api/articles/{ctx.article_id}", None)),
+        Scenario("articles.add", "POST", "/api/articles",
+                 {"title": "Benchmark", "description": "latency", "tags": "tag1, new-tag"},
+                 status=201),
+        Scenario("articles.update", "PUT", prepare=lambda ctx, i: (
+            f"/api/articles/{ctx.own_article_id}",
+            {"title": f"Benchmark {i}", "tags": "tag2, tag3"})),
+        Scenario("articles.delete", "DELETE", prepare=delete(
+            "/api/articles", {"title": "Doomed"}, "article", "/api/articles/{id}")),
+
+        Scenario("comments.index", "GET", prepare=lambda ctx, i: (
+            f"/api/articles/{ctx.article_id}/comments", None)),
+        Scenario("comments.tree", "GET", prepare=lambda ctx, i: (
+            f"/api/articles/{ctx.article_id}/comments?tree=1", None)),
+        Scenario("comments.add", "POST", prepare=lambda ctx, i: (
+            f"/api/articles/{ctx.article_id}/comments",
+            {"description": "Benchmark reply", "parent_id": ctx.comment_id}), status=201),
+        Scenario("comments.delete", "DELETE", prepare=lambda ctx, i: (
+            "/api/articles/{a}/comments/{c}".format(
+                a=ctx.article_id,
+                c=ctx.create(f"/api/articles/{ctx.article_id}/comments",
+                             {"description": "Doomed"}, "comment")), None)),
+
+        Scenario("categories.list", "GET", "/api/categories", cold=True),
+        Scenario("categories.list_cache_hit", "GET", "/api/categories"),
+
+        Scenario("feeds.list", "GET", "/api/feeds", client="anon"),
+        Scenario("feeds.status", "GET", "/api/feeds/status"),
+        Scenario("feeds.subscriptions_get", "GET", "/api/feeds/subscriptions"),
+        Scenario("feeds.subscriptions_put", "PUT", "/api/feeds/subscriptions",
+                 {"subreddits": ["python", "programming"]}),
+
+        Scenario("bookmarks.index", "GET", "/api/bookmarks"),
+        Scenario("bookmarks.add", "POST", "/api/bookmarks",
+                 {"url": "https://example.com/bench", "title": "Benchmark"}, status=201),
+        Scenario("bookmarks.delete", "DELETE", prepare=delete(
+            "/api/bookmarks", {"url": "https://example.com", "title": "Doomed"},
+            "bookmark", "/api/bookmarks/{id}")),
+
+        Scenario("shortener.index", "GET", "/api/shortener"),
+        Scenario("shortener.add", "POST", "/api/shortener",
+                 {"original_url": "https://example.com/bench"}, status=201),
+        Scenario("shortener.stats", "GET", prepare=lambda ctx, i: (
+            f"/api/shortener/{ctx.short_url_id}/stats", None)),
+        Scenario("shortener.delete", "DELETE", prepare=delete(
+            "/api/shortener", {"original_url": "https://example.com"}, "short_url",
+            "/api/shortener/{id}")),
+        Scenario("shortener.redirect", "GET",
+                 prepare=lambda ctx, i: (f"/s/{ctx.short_code}", None), status=302),
+
+        Scenario("metrics", "GET", "/api/_metrics", client="scraper"),
+    ]
+
+
+def _percentile(ordered, pct):
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarize(scenario, path, timings, queries):
+    ordered = sorted(timings)
+    total = sum(timings)
+    return {
+        "method": scenario.method,
+        "path": path,
+        "iterations": len(timings),
+        "mean_ms": round(total / len(timings) * 1000, 3),
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(_percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_rps": round(len(timings) / total, 1) if total else None,
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+    }
+
+
+def run(app, iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP, only=None, log=None):
+    """Run every scenario against ``app``'s seeded database; return a dict
+    of per-scenario results keyed by scenario name."""
+    from models import db
+    from response_cache import response_cache
+
+    with app.app_context():
+        engine = db.engine
+    _prime_feeds()
+    ctx = _Context(app)
+    query_count = [0]
+
+    def count(*args):
+        query_count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    results = {}
+    try:
+        for scenario in scenarios():
+            if only and not any(o in scenario.name for o in only):
+                continue
+            client = getattr(ctx, scenario.client)
+            runs = min(scenario.iterations or iterations, iterations)
+            timings, queries = [], []
+            for i in range(warmup + runs):
+                path, body = scenario.request(ctx, i)
+                if scenario.cold:
+                    response_cache.clear()
+                before = query_count[0]
+                start = time.perf_counter()
+                resp = client.open(path, method=scenario.method, json=body)
+                elapsed = time.perf_counter() - start
+                if resp.status_code != scenario.status:
+                    raise BenchmarkError(
+                        f"{scenario.name}: {scenario.method} {path} returned "
+                        f"{resp.status_code}, expected {scenario.status}"
+                    )
+                if i >= warmup:
+                    timings.append(elapsed)
+                    queries.append(query_count[0] - before)
+            results[scenario.name] = _summarize(scenario, path, timings, queries)
+            if log:
+                r = results[scenario.name]
+                log(f"{scenario.name:32} p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  "
+                    f"{r['throughput_rps'] or 0:9.1f} req/s  {r['queries_per_request']:6.2f} q/req")
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD,
+            min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """Return a list of regression messages for ``results`` against
+    ``baseline`` (both as written by :func:`main`)."""
+    regressions = []
+    base_results = baseline["results"]
+    for name, current in sorted(results["results"].items()):
+        base = base_results.get(name)
+        if base is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = base[metric], current[metric]
+            if after > before * (1 + threshold) and after - before >= min_delta_ms:
+                regressions.append(
+                    f"{name}: {metric} {before:.3f} -> {after:.3f} "
+                    f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)"
+                )
+        if current["queries_per_request"] > base["queries_per_request"]:
+            regressions.append(
+                f"{name}: queries/request {base['queries_per_request']} -> "
+                f"{current['queries_per_request']}"
+            )
+    return regressions
+
+
+def _parse_overrides(values):
+    overrides = {}
+    for value in values:
+        key, _, number = value.partition("=")
+        if key not in datagen.SCALES["tiny"] or not number.isdigit():
+            raise SystemExit(f"Invalid --set {value!r}; keys: {', '.join(datagen.SCALES['tiny'])}")
+        overrides[key] = int(number)
+    return overrides
+
+
+def _report(regressions, baseline_path):
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline_path}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {baseline_path}.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="small", choices=sorted(datagen.SCALES))
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=N",
+                        help="override one scale count, e.g. --set articles=10000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--only", action="append", help="run scenarios matching this")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--database-url")
+    parser.add_argument("--reset", action="store_true",
+                        help="allow dropping the tables at --database-url")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--compare", metavar="RESULTS",
+                        help="compare an existing results file instead of running")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare needs --baseline")
+        with open(args.compare) as f:
+            results = json.load(f)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return _report(compare(results, baseline, args.threshold, args.min_delta_ms),
+                       args.baseline)
+
+    if args.database_url and not args.reset:
+        parser.error("--database-url drops and recreates every table; pass --reset")
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    # app.py reads DATABASE_URL when it is imported.
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("METRICS_TOKEN", "benchmark")
+    logging.disable(logging.INFO)
+
+    from app import app
+    from models import db
+
+    scale = dict(datagen.SCALES[args.scale], **_parse_overrides(args.set))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        counts = datagen.generate(scale, seed=args.seed)
+        print(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+        dialect = db.engine.dialect.name
+
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "counts": counts,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "database": dialect,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": run(app, args.iterations, args.warmup, args.only, log=print),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return _report(compare(results, baseline, args.threshold, args.min_delta_ms),
+                       args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
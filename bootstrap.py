@@ -0,0 +1,73 @@
+import hashlib
+import json
+
+from flask import jsonify
+from flask_login import current_user
+
+from cache import LRUCache
+from routes.auth import _user_dict
+from routes.categories import registry
+from static_assets import assets, gzip_bytes
+
+SCRIPT_OPEN = '<script id="bootstrap" type="application/json">'
+# (index.html etag, category version[, variant]) -> pre-rendered page pieces
+page_cache = LRUCache(16)
+
+
+def _json(value):
+    # Safe inside <script>: nothing in the payload can close the element.
+    text = json.dumps(value, separators=(",", ":"))
+    return text.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+
+def _split(html, categories):
+    """Return the page before and after the spot where the user goes."""
+    at = html.find("</head>")
+    if at < 0:
+        at = len(html)
+    head = f'{html[:at]}{SCRIPT_OPEN}{{"categories":{_json(categories)},"user":'
+    return head, f"}}</script>{html[at:]}"
+
+
+def _template(categories, version):
+    key = (assets.index_etag, version)
+    parts = page_cache.get(key)
+    if parts is None:
+        parts = _split(assets.index_html, categories)
+        page_cache.set(key, parts)
+    return parts
+
+
+def _anonymous(categories, version):
+    key = (assets.index_etag, version, "anonymous")
+    page = page_cache.get(key)
+    if page is None:
+        head, tail = _template(categories, version)
+        body = f"{head}null{tail}".encode()
+        page = ({"identity": body, "gzip": gzip_bytes(body)},
+                hashlib.sha1(body).hexdigest()[:20])
+        page_cache.set(key, page)
+    return page
+
+
+def index_response():
+    """Serve ``index.html`` with the current user and the category list
+    inlined as JSON, saving the SPA its first /api/me and /api/categories
+    round trips.
+
+    The page is rebuilt only when the build or the category list changes.
+    Anonymous visitors share one cached, pre-compressed page. For a signed-in
+    user the serialized user is spliced between two cached halves.
+    """
+    if assets.index_etag is None:
+        return jsonify({"error": "Frontend not built."}), 404
+    categories, version = registry.listing()
+    if not current_user.is_authenticated:
+        resp = assets.html_response(*_anonymous(categories, version))
+    else:
+        head, tail = _template(categories, version)
+        body = f"{head}{_json(_user_dict(current_user))}{tail}".encode()
+        resp = assets.html_response({"identity": body}, hashlib.sha1(body).hexdigest()[:20],
+                                    cache_control="private, no-cache")
+    resp.vary.add("Cookie")
+    return resp
@@ -0,0 +1,82 @@
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops calling a dependency that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    :meth:`allow` refuses calls for ``reset_timeout`` seconds. Once that
+    passes, a single trial call is let through (half-open). If the trial
+    succeeds the breaker closes again. If it fails, the breaker reopens and
+    the timeout doubles, up to ``max_timeout``. Timeouts are jittered by up
+    to ``jitter`` (a fraction) so breakers that opened together don't all
+    retry at once.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, max_timeout=600,
+                 jitter=0.2, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.jitter = jitter
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened = 0  # consecutive times opened, for the backoff
+        self._retry_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._retry_at:
+                return HALF_OPEN
+            return self._state
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def retry_at(self):
+        """Clock time at which an open breaker will let a trial through."""
+        return self._retry_at if self._state == OPEN else None
+
+    def allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self._clock() < self._retry_at:
+                    return False
+                self._state = HALF_OPEN
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened = 0
+            self._retry_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                timeout = min(self.reset_timeout * 2 ** self._opened, self.max_timeout)
+                timeout *= 1 + random.uniform(0, self.jitter)
+                self._state = OPEN
+                self._opened += 1
+                self._retry_at = self._clock() + timeout
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with optional per-entry TTLs."""
+
+    def __init__(self, maxsize, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Shared cache backends. All of them store JSON-serializable values under
+# string keys with a TTL in seconds, and expose the same small interface:
+# get(key) -> value or None, set(key, value, ttl), add(key, value, ttl) ->
+# bool (set only if absent, for leases), and delete(key).
+
+
+class MemoryCache(LRUCache):
+    """Per-process backend; also the stand-in used by tests."""
+
+    def __init__(self, maxsize=1024, clock=time.monotonic):
+        super().__init__(maxsize, clock=clock)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > self._clock()):
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        self.pop(key)
+
+
+class SQLiteCache:
+    """Backend in a SQLite file, shared by every worker on one host.
+
+    Runs in WAL mode with the file memory-mapped, so readers in different
+    processes don't block each other and hits are served from the page
+    cache.
+    """
+
+    PURGE_EVERY = 100
+    MMAP_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        # Connections are per thread and never inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, self._clock())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, json.dumps(value), self._clock() + ttl),
+        )
+        self._maybe_purge()
+
+    def add(self, key, value, ttl):
+        now = self._clock()
+        cursor = self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (key, json.dumps(value), now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _maybe_purge(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM cache WHERE expires <= ?", (self._clock(),))
+
+
+class RedisCache:
+    """Backend speaking the Redis protocol, for deployments spanning hosts.
+
+    Talks RESP over a plain socket (one connection per thread), so any
+    Redis-compatible server works and no client library is needed.
+    Connection errors are logged and treated as cache misses.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None,
+                 prefix="vibe:", timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, key):
+        raw = self._call("GET", self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value, ttl):
+        self._call("SET", self.prefix + key, json.dumps(value), "PX", int(ttl * 1000))
+
+    def add(self, key, value, ttl):
+        reply = self._call(
+            "SET", self.prefix + key, json.dumps(value), "NX", "PX", int(ttl * 1000)
+        )
+        return reply == "OK"
+
+    def delete(self, key):
+        self._call("DEL", self.prefix + key)
+
+    def _call(self, *args):
+        try:
+            return self._command(*args)
+        except (OSError, RedisError) as e:
+            logger.warning("Redis cache %s failed: %s", args[0], e)
+            self._close()
+            return None
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        sock.sendall(_encode_command(args))
+        return _read_reply(reader)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            reader = sock.makefile("rb")
+            conn = (sock, reader)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", self.db)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+
+class RedisError(Exception):
+    pass
+
+
+def _encode_command(args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise RedisError("Connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        count = int(rest)
+        return None if count < 0 else [_read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected reply {line!r}")
+
+
+def cache_from_url(url, maxsize=1024):
+    """Build a backend from a URL: ``memory://``, ``sqlite:///path/to/file``
+    or ``redis://[:password@]host[:port][/db]``. ``maxsize`` bounds the
+    memory backend; the others expire entries by TTL only."""
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        return MemoryCache(maxsize)
+    if parts.scheme == "sqlite":
+        # Same convention as SQLAlchemy: sqlite:///relative, sqlite:////absolute.
+        return SQLiteCache(parts.path[1:])
+    if parts.scheme == "redis":
+        db_index = parts.path.lstrip("/")
+        return RedisCache(
+            host=parts.hostname or "localhost",
+            port=parts.port or 6379,
+            db=int(db_index) if db_index else 0,
+            password=parts.password,
+        )
+    raise ValueError(f"Unsupported cache URL: {url}")
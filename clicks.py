@@ -0,0 +1,226 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, delete, func, select, update
+
+from models import db, dialect_insert, ClickRollup, ShortUrl
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 5  # seconds
+ROLLUP_RETENTION_DAYS = 7  # hourly rows older than this are folded into days
+COMPACT_BATCH_SIZE = 5000
+
+# Checked in order; the first marker found in the user agent wins.
+AGENT_FAMILIES = [
+    ("bot", ("bot", "crawler", "spider", "slurp")),
+    ("edge", ("edg/",)),
+    ("opera", ("opr/", "opera")),
+    ("chrome", ("chrome/", "crios/")),
+    ("firefox", ("firefox/", "fxios/")),
+    ("safari", ("safari/",)),
+    ("curl", ("curl/",)),
+]
+
+
+def agent_family(user_agent):
+    ua = (user_agent or "").lower()
+    if not ua:
+        return "unknown"
+    for family, markers in AGENT_FAMILIES:
+        if any(m in ua for m in markers):
+            return family
+    return "other"
+
+
+def referrer_host(referrer):
+    if not referrer:
+        return ""
+    try:
+        return (urlsplit(referrer).hostname or "")[:255]
+    except ValueError:  # e.g. "http://[bad/"; clients control this header
+        return ""
+
+
+def _hour(now):
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ClickCounter:
+    """Buffers short URL clicks in memory and writes them in batches.
+
+    Every flush writes two things in one transaction. The first is one
+    ``click_count = click_count + n`` UPDATE per clicked URL. The second is
+    an upsert of the hourly ``ClickRollup`` rows, keyed by referrer host and
+    user-agent family. Both go out as executemany batches. A background
+    thread flushes every ``interval`` seconds and a final flush runs at
+    interpreter exit. Under ``TESTING`` no thread is started and tests call
+    :meth:`flush` themselves.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL, clock=_utcnow):
+        self.interval = interval
+        self._clock = clock
+        self._counts = Counter()
+        self._rollups = Counter()
+        self._lock = threading.Lock()
+        self.recorded = 0  # clicks seen by this process, for cache validators
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions["click_counter"] = self
+        atexit.register(self.close)
+
+    def record(self, short_url_id, referrer=None, user_agent=None):
+        key = (
+            short_url_id,
+            _hour(self._clock()),
+            referrer_host(referrer),
+            agent_family(user_agent),
+        )
+        with self._lock:
+            self._counts[short_url_id] += 1
+            self.recorded += 1
+            self._rollups[key] += 1
+            if self._thread is None and not self._app.testing:
+                self._thread = threading.Thread(
+                    target=self._run, name="click-counter", daemon=True
+                )
+                self._thread.start()
+
+    def pending(self, short_url_id):
+        with self._lock:
+            return self._counts.get(short_url_id, 0)
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            rollups, self._rollups = self._rollups, Counter()
+        if not counts:
+            return 0
+        try:
+            with self._app.app_context():
+                self._write(counts, rollups)
+        except Exception:
+            logger.exception("Failed to flush clicks for %d short URLs", len(counts))
+            with self._lock:
+                self._counts.update(counts)
+                self._rollups.update(rollups)
+            return 0
+        return len(counts)
+
+    def _write(self, counts, rollups):
+        table = ShortUrl.__table__
+        # URLs deleted since the click would fail the rollup foreign key.
+        live = set(
+            db.session.scalars(select(table.c.id).where(table.c.id.in_(list(counts))))
+        )
+        if not live:
+            return
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("url_id"))
+            .values(click_count=func.coalesce(table.c.click_count, 0) + bindparam("n")),
+            [{"url_id": url_id, "n": n} for url_id, n in counts.items() if url_id in live],
+        )
+        rows = [
+            {
+                "short_url_id": url_id,
+                "granularity": "hour",
+                "bucket": bucket,
+                "referrer": referrer,
+                "agent": agent,
+                "clicks": n,
+            }
+            for (url_id, bucket, referrer, agent), n in rollups.items()
+            if url_id in live
+        ]
+        _upsert_rollups(rows)
+        db.session.commit()
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._rollups.clear()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+def _upsert_rollups(rows):
+    if not rows:
+        return
+    table = ClickRollup.__table__
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["short_url_id", "granularity", "bucket", "referrer", "agent"],
+        set_={"clicks": table.c.clicks + stmt.excluded.clicks},
+    )
+    db.session.execute(stmt, rows)
+
+
+def compact_rollups(now=None, retention_days=ROLLUP_RETENTION_DAYS):
+    """Fold hourly rollups older than the retention window into daily rows.
+
+    Works through the old rows in batches and returns how many hourly rows
+    were folded.
+    """
+    now = now or _utcnow()
+    cutoff = (now - timedelta(days=retention_days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    table = ClickRollup.__table__
+    folded = 0
+    while True:
+        batch = db.session.execute(
+            select(
+                table.c.id,
+                table.c.short_url_id,
+                table.c.bucket,
+                table.c.referrer,
+                table.c.agent,
+                table.c.clicks,
+            )
+            .where(table.c.granularity == "hour", table.c.bucket < cutoff)
+            .order_by(table.c.id)
+            .limit(COMPACT_BATCH_SIZE)
+        ).all()
+        if not batch:
+            return folded
+        days = Counter()
+        for row in batch:
+            day = row.bucket.replace(hour=0)
+            days[(row.short_url_id, day, row.referrer, row.agent)] += row.clicks
+        _upsert_rollups([
+            {
+                "short_url_id": url_id,
+                "granularity": "day",
+                "bucket": day,
+                "referrer": referrer,
+                "agent": agent,
+                "clicks": n,
+            }
+            for (url_id, day, referrer, agent), n in days.items()
+        ])
+        db.session.execute(delete(table).where(table.c.id.in_([r.id for r in batch])))
+        db.session.commit()
+        folded += len(batch)
+
+
+click_counter = ClickCounter()
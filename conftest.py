@@ -1,7 +1,19 @@
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 
 from app import app as flask_app
+from bootstrap import page_cache
+from clicks import click_counter
+from metrics import metrics
 from models import db as _db, User
+from response_cache import response_cache
+from routes.auth import user_cache
+from routes.categories import registry as category_registry
+from routes.shortener import redirect_cache
+from shortcodes import allocator
+from versions import versions
 
 
 @pytest.fixture()
@@ -12,13 +24,28 @@ def app():
             "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
             "WTF_CSRF_ENABLED": False,
             "SECRET_KEY": "test-secret",
+            # Cheap, inline hashing; test_passwords covers the pool.
+            "PASSWORD_HASH_ITERATIONS": 1000,
+            "PASSWORD_HASH_WORKERS": 0,
+            "VERSION_CACHE_URL": "memory://",
+            "METRICS_TOKEN": "test-metrics-token",
         }
     )
+    redirect_cache.clear()
+    user_cache.clear()
+    page_cache.clear()
+    category_registry.invalidate()
+    metrics.clear()
+    versions.clear()
+    response_cache.clear()
+    click_counter.clear()
+    allocator.reset()
     with flask_app.app_context():
         _db.create_all()
         yield flask_app
         _db.session.remove()
         _db.drop_all()
+    click_counter.clear()
 
 
 @pytest.fixture()
@@ -66,3 +93,17 @@ def signup(client, username="alice", password="password123"):
         "/api/signup",
         json={"username": username, "password": password},
     )
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
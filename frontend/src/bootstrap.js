@@ -0,0 +1,8 @@
+// Data the server inlines into index.html so the first render needn't wait
+// on /api/me and /api/categories. Absent under the Vite dev server.
+const element = document.getElementById('bootstrap');
+const data = element ? JSON.parse(element.textContent) : {};
+
+export function bootstrapped(key) {
+  return data[key];
+}
@@ -1,10 +1,11 @@
 import { createContext, useContext, useState, useEffect } from 'react';
 import { get, post } from '../api';
+import { bootstrapped } from '../bootstrap';
 
 export const AuthContext = createContext(null);
 
 export function AuthProvider({ children }) {
-  const [user, setUser] = useState(undefined);
+  const [user, setUser] = useState(() => bootstrapped('user'));
 
   async function refreshUser() {
     const { data } = await get('/api/me');
@@ -12,7 +13,7 @@ export function AuthProvider({ children }) {
   }
 
   useEffect(() => {
-    refreshUser();
+    if (user === undefined) refreshUser();
   }, []);
 
   async function loginFn(username, password) {
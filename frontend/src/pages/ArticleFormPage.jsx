@@ -7,6 +7,7 @@ import Form from 'react-bootstrap/Form';
 import Button from 'react-bootstrap/Button';
 import { get, post, put } from '../api';
 import { useAuth } from '../context/AuthContext';
+import { bootstrapped } from '../bootstrap';
 import FlashMessage from '../components/FlashMessage';
 
 export default function ArticleFormPage() {
@@ -16,7 +17,7 @@ export default function ArticleFormPage() {
   const [description, setDescription] = useState('');
   const [tags, setTags] = useState('');
   const [categoryId, setCategoryId] = useState('');
-  const [categories, setCategories] = useState([]);
+  const [categories, setCategories] = useState(() => bootstrapped('categories') ?? []);
   const [error, setError] = useState('');
   const { user } = useAuth();
   const navigate = useNavigate();
@@ -31,7 +32,7 @@ export default function ArticleFormPage() {
       const { res, data } = await get('/api/categories');
       if (res.ok) setCategories(data.categories);
     }
-    loadCategories();
+    if (bootstrapped('categories') === undefined) loadCategories();
 
     if (isEdit) {
       async function load() {
@@ -4,16 +4,18 @@ import Badge from 'react-bootstrap/Badge';
 import Button from 'react-bootstrap/Button';
 import Form from 'react-bootstrap/Form';
 import { get, del } from '../api';
+import { getAll } from '../pagination';
 import { useAuth } from '../context/AuthContext';
+import { bootstrapped } from '../bootstrap';
 
 export default function ArticlesPage() {
   const [articles, setArticles] = useState([]);
-  const [categories, setCategories] = useState([]);
+  const [categories, setCategories] = useState(() => bootstrapped('categories') ?? []);
   const [categoryFilter, setCategoryFilter] = useState('');
   const { user } = useAuth();
 
   async function fetchArticles() {
-    const { data } = await get('/api/articles');
+    const { data } = await getAll('/api/articles', 'articles');
     setArticles(data.articles);
   }
 
@@ -23,7 +25,7 @@ export default function ArticlesPage() {
       const { res, data } = await get('/api/categories');
       if (res.ok) setCategories(data.categories);
     }
-    fetchCategories();
+    if (bootstrapped('categories') === undefined) fetchCategories();
   }, []);
 
   async function handleDelete(id) {
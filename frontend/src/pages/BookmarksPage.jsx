@@ -5,7 +5,8 @@ import ListGroup from 'react-bootstrap/ListGroup';
 import Spinner from 'react-bootstrap/Spinner';
 import Alert from 'react-bootstrap/Alert';
 import Card from 'react-bootstrap/Card';
-import { get, post, del } from '../api';
+import { post, del } from '../api';
+import { getAll } from '../pagination';
 import { useAuth } from '../context/AuthContext';
 
 export default function BookmarksPage() {
@@ -20,7 +21,7 @@ export default function BookmarksPage() {
   async function fetchBookmarks() {
     setLoading(true);
     try {
-      const { res, data } = await get('/api/bookmarks');
+      const { res, data } = await getAll('/api/bookmarks', 'bookmarks');
       if (res.ok) {
         setBookmarks(data.bookmarks);
       } else {
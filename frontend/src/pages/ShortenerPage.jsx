@@ -6,7 +6,8 @@ import Spinner from 'react-bootstrap/Spinner';
 import Alert from 'react-bootstrap/Alert';
 import InputGroup from 'react-bootstrap/InputGroup';
 import FormControl from 'react-bootstrap/FormControl';
-import { get, post, del } from '../api';
+import { post, del } from '../api';
+import { getAll } from '../pagination';
 import { useAuth } from '../context/AuthContext';
 
 export default function ShortenerPage() {
@@ -20,7 +21,7 @@ export default function ShortenerPage() {
   async function fetchShortUrls() {
     setLoading(true);
     try {
-      const { res, data } = await get('/api/shortener');
+      const { res, data } = await getAll('/api/shortener', 'short_urls');
       if (res.ok) {
         setShortUrls(data.short_urls);
       } else {
@@ -4,7 +4,8 @@ import FormControl from 'react-bootstrap/FormControl';
 import Button from 'react-bootstrap/Button';
 import ListGroup from 'react-bootstrap/ListGroup';
 import Form from 'react-bootstrap/Form';
-import { get, post, patch, del } from '../api';
+import { post, patch, del } from '../api';
+import { getAll } from '../pagination';
 import { useAuth } from '../context/AuthContext';
 import FlashMessage from '../components/FlashMessage';
 
@@ -15,7 +16,7 @@ export default function TodosPage() {
   const { user } = useAuth();
 
   async function fetchTodos() {
-    const { data } = await get('/api/todos');
+    const { data } = await getAll('/api/todos', 'todos');
     setTodos(data.todos);
   }
 
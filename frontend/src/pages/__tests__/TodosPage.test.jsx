@@ -28,6 +28,21 @@ describe('TodosPage', () => {
     });
   });
 
+  it('follows next_cursor to load every page', async () => {
+    get.mockImplementation((url) => Promise.resolve(
+      url === '/api/todos'
+        ? { data: { todos: [createMockTodo({ id: 1, title: 'Buy milk' })], next_cursor: 'abc' } }
+        : { data: { todos: [createMockTodo({ id: 2, title: 'Walk dog' })], next_cursor: null } },
+    ));
+    renderWithProviders(<TodosPage />);
+
+    await waitFor(() => {
+      expect(screen.getByText(/Buy milk/)).toBeInTheDocument();
+      expect(screen.getByText(/Walk dog/)).toBeInTheDocument();
+    });
+    expect(get).toHaveBeenCalledWith('/api/todos?cursor=abc');
+  });
+
   it('shows empty message when no todos', async () => {
     renderWithProviders(<TodosPage />);
 
@@ -0,0 +1,16 @@
+import { get } from './api';
+
+// List endpoints return at most one page plus a next_cursor. Follow the
+// cursors and hand back every item under `key`, in the shape get() uses.
+export async function getAll(url, key) {
+  const items = [];
+  let page = await get(url);
+  for (;;) {
+    const { res, data } = page;
+    if (res && !res.ok) return page;
+    items.push(...data[key]);
+    if (!data.next_cursor) return { res, data: { ...data, [key]: items } };
+    const sep = url.includes('?') ? '&' : '?';
+    page = await get(`${url}${sep}cursor=${encodeURIComponent(data.next_cursor)}`);
+  }
+}
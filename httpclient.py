@@ -0,0 +1,84 @@
+import gzip
+import http.client
+import logging
+import queue
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClient:
+    """Small keep-alive HTTP client bound to one origin.
+
+    Connections are pooled (up to ``max_connections`` idle ones are kept)
+    and reused across requests and threads. Every request asks for gzip and
+    bodies are transparently decompressed. A request that fails on a reused
+    connection, which the server may have closed, is retried once on a
+    fresh connection.
+    """
+
+    def __init__(self, base_url, max_connections=8, timeout=10, headers=None):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._idle = queue.LifoQueue(maxsize=max_connections)
+
+    def get(self, path, headers=None):
+        """Return ``(status, headers, body)`` with ``body`` decompressed."""
+        request_headers = {**self.headers, "Accept-Encoding": "gzip", **(headers or {})}
+        conn, reused = self._acquire()
+        try:
+            status, response_headers, body = self._send(conn, path, request_headers)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            conn, reused = self._new_connection(), False
+            try:
+                status, response_headers, body = self._send(conn, path, request_headers)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        if response_headers.get("connection", "").lower() == "close":
+            conn.close()
+        else:
+            self._release(conn)
+        if response_headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return status, response_headers, body
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _send(self, conn, path, headers):
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, body
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
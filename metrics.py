@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-endpoint request and SQL metrics, rendered for Prometheus.
+
+    ``before_request``/``after_request`` hooks time every request. Engine
+    ``before_cursor_execute``/``after_cursor_execute`` hooks count the
+    queries each request runs and the time spent in them. Requests are
+    labelled by Flask endpoint, not by URL, so label cardinality stays
+    bounded. Any query slower than ``SLOW_QUERY_THRESHOLD`` seconds is
+    logged with the route that ran it. Only the statement is logged: its
+    parameters can hold password hashes and other user data. Queries
+    outside a request are only checked against that threshold.
+
+    Everything is counted per process, so each worker has to be scraped
+    separately; their series are summed in Prometheus.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: _Histogram(LATENCY_BUCKETS))
+        self._sizes = defaultdict(lambda: _Histogram(SIZE_BUCKETS))
+        self._query_counts = defaultdict(lambda: _Histogram(QUERY_BUCKETS))
+        self._requests = Counter()
+        self._sql_seconds = Counter()
+        self._slow_queries = Counter()
+        self._response_cache = Counter()
+        self._listening = False
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions["metrics"] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+            self._listening = True
+
+    def clear(self):
+        with self._lock:
+            for series in (self._durations, self._sizes, self._query_counts,
+                           self._requests, self._sql_seconds, self._slow_queries,
+                           self._response_cache):
+                series.clear()
+
+    def response_cache_lookup(self, endpoint, hit):
+        with self._lock:
+            self._response_cache[(endpoint, "hit" if hit else "miss")] += 1
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    def _after_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        with self._lock:
+            self._durations[(endpoint, request.method)].observe(elapsed)
+            self._requests[(endpoint, request.method, str(response.status_code))] += 1
+            self._sizes[(endpoint,)].observe(response.content_length or 0)
+            self._query_counts[(endpoint,)].observe(g.sql_queries)
+            self._sql_seconds[(endpoint,)] += g.sql_seconds
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context,
+                               executemany):
+        context.metrics_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context,
+                              executemany):
+        elapsed = time.perf_counter() - context.metrics_start
+        in_request = has_request_context() and "metrics_start" in g
+        if in_request:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+        threshold = self._app.config["SLOW_QUERY_THRESHOLD"] if self._app else None
+        if threshold is None or elapsed < threshold:
+            return
+        if in_request:
+            endpoint = request.endpoint or "unmatched"
+            rule = request.url_rule.rule if request.url_rule else request.path
+            route = f"{request.method} {rule} ({endpoint})"
+            with self._lock:
+                self._slow_queries[(endpoint,)] += 1
+        else:
+            route = "outside a request"
+        logger.warning("Slow query (%.1f ms) in %s: %s", elapsed * 1000, route, statement)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            _histogram(lines, "http_request_duration_seconds",
+                       "Request latency by endpoint.", ("endpoint", "method"),
+                       self._durations)
+            _counter(lines, "http_requests_total", "Requests by endpoint and status.",
+                     ("endpoint", "method", "status"), self._requests)
+            _histogram(lines, "http_response_size_bytes", "Response body size by endpoint.",
+                       ("endpoint",), self._sizes)
+            _histogram(lines, "http_request_sql_queries", "SQL queries per request.",
+                       ("endpoint",), self._query_counts)
+            _counter(lines, "http_request_sql_seconds_total",
+                     "Time spent in SQL by endpoint.", ("endpoint",), self._sql_seconds)
+            _counter(lines, "sql_slow_queries_total",
+                     "Queries over SLOW_QUERY_THRESHOLD by endpoint.", ("endpoint",),
+                     self._slow_queries)
+            _counter(lines, "response_cache_lookups_total",
+                     "Response cache lookups by endpoint and result.",
+                     ("endpoint", "result"), self._response_cache)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _counter(lines, name, help_text, label_names, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(series.items()):
+        lines.append(f"{name}{_labels(label_names, key)} {_number(value)}")
+
+
+def _histogram(lines, name, help_text, label_names, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, hist in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            le = _labels(label_names, key, [("le", _number(bound))])
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        le = _labels(label_names, key, [("le", "+Inf")])
+        lines.append(f"{name}_bucket{le} {hist.count}")
+        lines.append(f"{name}_sum{_labels(label_names, key)} {_number(hist.sum)}")
+        lines.append(f"{name}_count{_labels(label_names, key)} {hist.count}")
+
+
+metrics = Metrics()
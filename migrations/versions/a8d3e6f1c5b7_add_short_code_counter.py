@@ -0,0 +1,34 @@
+"""add short code counter
+
+Revision ID: a8d3e6f1c5b7
+Revises: f6c2d9a8b4e3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import table, column
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e6f1c5b7'
+down_revision = 'f6c2d9a8b4e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'short_code_counter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    counter_table = table(
+        'short_code_counter', column('id', sa.Integer), column('next_value', sa.BigInteger)
+    )
+    op.bulk_insert(counter_table, [{'id': 1, 'next_value': 0}])
+
+
+def downgrade():
+    op.drop_table('short_code_counter')
@@ -0,0 +1,30 @@
+"""add keyset pagination indexes
+
+Revision ID: b7e2c91d4f30
+Revises: 2e6ee16e957d
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c91d4f30'
+down_revision = '2e6ee16e957d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_bookmark_user_created', 'bookmark', ['user_id', 'created_at', 'id']
+    )
+    op.create_index(
+        'ix_short_url_user_created', 'short_url', ['user_id', 'created_at', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_short_url_user_created', table_name='short_url')
+    op.drop_index('ix_bookmark_user_created', table_name='bookmark')
@@ -0,0 +1,39 @@
+"""add click rollup
+
+Revision ID: b9e4f7a2d6c8
+Revises: a8d3e6f1c5b7
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4f7a2d6c8'
+down_revision = 'a8d3e6f1c5b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'click_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('short_url_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('referrer', sa.String(length=255), nullable=False),
+        sa.Column('agent', sa.String(length=32), nullable=False),
+        sa.Column('clicks', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['short_url_id'], ['short_url.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'short_url_id', 'granularity', 'bucket', 'referrer', 'agent',
+            name='uq_click_rollup_key',
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table('click_rollup')
@@ -0,0 +1,33 @@
+"""add feed subscription
+
+Revision ID: c1a5e8d3f7b2
+Revises: b9e4f7a2d6c8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1a5e8d3f7b2'
+down_revision = 'b9e4f7a2d6c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'feed_subscription',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('subreddit', sa.String(length=32), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'subreddit', name='uq_feed_subscription_user_subreddit'),
+    )
+
+
+def downgrade():
+    op.drop_table('feed_subscription')
@@ -0,0 +1,65 @@
+"""add article full-text search
+
+Revision ID: c3f8a2d6e1b9
+Revises: b7e2c91d4f30
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a2d6e1b9'
+down_revision = 'b7e2c91d4f30'
+branch_labels = None
+depends_on = None
+
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE article ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX ix_article_search_vector ON article USING gin (search_vector)",
+]
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE article_fts USING fts5("
+    "title, description, content='article', content_rowid='id')",
+    "CREATE TRIGGER article_fts_ai AFTER INSERT ON article BEGIN "
+    "INSERT INTO article_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER article_fts_ad AFTER DELETE ON article BEGIN "
+    "INSERT INTO article_fts(article_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER article_fts_au AFTER UPDATE ON article BEGIN "
+    "INSERT INTO article_fts(article_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO article_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO article_fts(article_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_UPGRADE
+    elif dialect == 'sqlite':
+        statements = SQLITE_UPGRADE
+    else:
+        statements = []
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_article_search_vector')
+        op.execute('ALTER TABLE article DROP COLUMN IF EXISTS search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('article_fts_ai', 'article_fts_ad', 'article_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS article_fts')
@@ -0,0 +1,58 @@
+"""normalize tag names
+
+Revision ID: d4a9e7b3c2f1
+Revises: c3f8a2d6e1b9
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9e7b3c2f1'
+down_revision = 'c3f8a2d6e1b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fold tags that differ only in case or whitespace into the oldest one,
+    # moving their article links across, then store the normalized name.
+    conn = op.get_bind()
+    groups = {}
+    for tag_id, name in conn.execute(sa.text('SELECT id, name FROM tag ORDER BY id')):
+        groups.setdefault(' '.join(name.split()).lower(), []).append(tag_id)
+
+    for name, ids in groups.items():
+        keep, dupes = ids[0], ids[1:]
+        if dupes:
+            params = {'keep': keep, 'dupes': dupes}
+            conn.execute(
+                sa.text(
+                    'INSERT INTO article_tags (article_id, tag_id) '
+                    'SELECT DISTINCT article_id, :keep FROM article_tags '
+                    'WHERE tag_id IN :dupes AND article_id NOT IN '
+                    '(SELECT article_id FROM article_tags WHERE tag_id = :keep)'
+                ).bindparams(sa.bindparam('dupes', expanding=True)),
+                params,
+            )
+            conn.execute(
+                sa.text('DELETE FROM article_tags WHERE tag_id IN :dupes')
+                .bindparams(sa.bindparam('dupes', expanding=True)),
+                params,
+            )
+            conn.execute(
+                sa.text('DELETE FROM tag WHERE id IN :dupes')
+                .bindparams(sa.bindparam('dupes', expanding=True)),
+                params,
+            )
+        conn.execute(
+            sa.text('UPDATE tag SET name = :name WHERE id = :keep'),
+            {'name': name, 'keep': keep},
+        )
+
+
+def downgrade():
+    # Merged tags cannot be split back apart.
+    pass
@@ -0,0 +1,35 @@
+"""make bookmark and short_url created_at not null
+
+Revision ID: e2d7b4a9c6f1
+Revises: c1a5e8d3f7b2
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d7b4a9c6f1'
+down_revision = 'c1a5e8d3f7b2'
+branch_labels = None
+depends_on = None
+
+# Keyset pages seek on (created_at, id); a NULL never compares, so its row
+# would drop out of every page.
+TABLES = ['bookmark', 'short_url']
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(
+            f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
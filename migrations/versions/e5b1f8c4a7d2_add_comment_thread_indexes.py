@@ -0,0 +1,28 @@
+"""add comment thread indexes
+
+Revision ID: e5b1f8c4a7d2
+Revises: d4a9e7b3c2f1
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1f8c4a7d2'
+down_revision = 'd4a9e7b3c2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_comment_article_parent', 'comment', ['article_id', 'parent_id', 'id']
+    )
+    op.create_index('ix_comment_parent', 'comment', ['parent_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_comment_parent', table_name='comment')
+    op.drop_index('ix_comment_article_parent', table_name='comment')
@@ -0,0 +1,39 @@
+"""cascade comment and tag deletes in the database
+
+Revision ID: f6c2d9a8b4e3
+Revises: e5b1f8c4a7d2
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6c2d9a8b4e3'
+down_revision = 'e5b1f8c4a7d2'
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEYS = [
+    ('comment_article_id_fkey', 'comment', 'article', ['article_id']),
+    ('comment_parent_id_fkey', 'comment', 'comment', ['parent_id']),
+    ('article_tags_article_id_fkey', 'article_tags', 'article', ['article_id']),
+    ('article_tags_tag_id_fkey', 'article_tags', 'tag', ['tag_id']),
+]
+
+
+def _recreate(ondelete):
+    for name, source, referent, columns in FOREIGN_KEYS:
+        with op.batch_alter_table(source, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, referent, columns, ['id'], ondelete=ondelete
+            )
+
+
+def upgrade():
+    _recreate('CASCADE')
+
+
+def downgrade():
+    _recreate(None)
@@ -1,13 +1,45 @@
+import sqlite3
+
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+from passwords import hasher
 
 db = SQLAlchemy()
 
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(target):
+    """Return an INSERT for ``target`` that supports ``on_conflict_*`` on the
+    configured backend."""
+    return _DIALECT_INSERTS[db.engine.dialect.name](target)
+
+
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on
+    # for each connection.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 article_tags = db.Table(
     "article_tags",
-    db.Column("article_id", db.Integer, db.ForeignKey("article.id"), primary_key=True),
-    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id"), primary_key=True),
+    db.Column(
+        "article_id",
+        db.Integer,
+        db.ForeignKey("article.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True
+    ),
 )
 
 
@@ -19,10 +51,10 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(256), nullable=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method="pbkdf2:sha256")
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
 
 
 class Todo(db.Model):
@@ -55,32 +87,93 @@ class Article(db.Model):
 
     user = db.relationship("User", backref="articles", lazy=True)
     category = db.relationship("Category", backref="articles", lazy=True)
+    # Deletes cascade in the database (ON DELETE CASCADE) so the ORM never
+    # loads a whole comment thread just to delete it row by row.
     comments = db.relationship(
-        "Comment", backref="article", cascade="all, delete-orphan", lazy=True
+        "Comment",
+        backref="article",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy=True,
+    )
+    tag_objects = db.relationship(
+        "Tag", secondary=article_tags, passive_deletes=True, lazy=True
     )
-    tag_objects = db.relationship("Tag", secondary=article_tags, lazy=True)
 
     @property
     def tags(self):
         return [t.name for t in self.tag_objects]
 
 
+# Full-text search is maintained by the database, outside the ORM: a generated
+# tsvector column with a GIN index on Postgres, and an FTS5 external-content
+# table kept in sync by triggers on SQLite. Migration c3f8a2d6e1b9 creates the
+# same objects on existing databases.
+ARTICLE_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE article ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        ") STORED",
+        "CREATE INDEX IF NOT EXISTS ix_article_search_vector "
+        "ON article USING gin (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5("
+        "title, description, content='article', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS article_fts_ai AFTER INSERT ON article BEGIN "
+        "INSERT INTO article_fts(rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN "
+        "INSERT INTO article_fts(article_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS article_fts_au AFTER UPDATE ON article BEGIN "
+        "INSERT INTO article_fts(article_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO article_fts(rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END",
+    ],
+}
+
+for _dialect, _statements in ARTICLE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            Article.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect)
+        )
+event.listen(
+    Article.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS article_fts").execute_if(dialect="sqlite"),
+)
+
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     author = db.Column(db.String(128), default="Anonymous")
     description = db.Column(db.Text, nullable=False)
-    article_id = db.Column(db.Integer, db.ForeignKey("article.id"), nullable=False)
+    article_id = db.Column(
+        db.Integer, db.ForeignKey("article.id", ondelete="CASCADE"), nullable=False
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
-    parent_id = db.Column(db.Integer, db.ForeignKey("comment.id"), nullable=True)
+    parent_id = db.Column(
+        db.Integer, db.ForeignKey("comment.id", ondelete="CASCADE"), nullable=True
+    )
 
     user = db.relationship("User", backref="comments", lazy=True)
     replies = db.relationship(
         "Comment",
         backref=db.backref("parent", remote_side="Comment.id"),
         cascade="all, delete-orphan",
+        passive_deletes=True,
         lazy=True,
     )
 
+    __table_args__ = (
+        db.Index("ix_comment_article_parent", "article_id", "parent_id", "id"),
+        db.Index("ix_comment_parent", "parent_id", "id"),
+    )
+
 
 class Bookmark(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -88,10 +181,19 @@ class Bookmark(db.Model):
     title = db.Column(db.String(256), nullable=False)
     description = db.Column(db.Text, default="")
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.now())
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
 
     user = db.relationship("User", backref="bookmarks", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_bookmark_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class ShortCodeCounter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=0)
+
 
 class ShortUrl(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -99,6 +201,49 @@ class ShortUrl(db.Model):
     original_url = db.Column(db.String(2048), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     click_count = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=db.func.now())
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
 
     user = db.relationship("User", backref="short_urls", lazy=True)
+
+    __table_args__ = (
+        db.Index("ix_short_url_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class ClickRollup(db.Model):
+    """Pre-aggregated redirect counts for one short URL.
+
+    ``bucket`` is the start of the hour (or day, once compacted) in UTC.
+    ``referrer`` is the referring host, empty for direct visits, and
+    ``agent`` is a coarse user-agent family.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    short_url_id = db.Column(
+        db.Integer, db.ForeignKey("short_url.id", ondelete="CASCADE"), nullable=False
+    )
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)
+    referrer = db.Column(db.String(255), nullable=False, default="")
+    agent = db.Column(db.String(32), nullable=False)
+    clicks = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "short_url_id", "granularity", "bucket", "referrer", "agent",
+            name="uq_click_rollup_key",
+        ),
+    )
+
+
+class FeedSubscription(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False
+    )
+    subreddit = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "subreddit", name="uq_feed_subscription_user_subreddit"),
+    )
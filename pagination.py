@@ -0,0 +1,101 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import DateTime, Float, Integer, String, and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_limit():
+    raw = request.args.get("limit")
+    if raw is None or raw == "":
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError("Invalid limit.")
+    if limit < 1:
+        raise PaginationError("Invalid limit.")
+    return min(limit, MAX_LIMIT)
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise PaginationError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise PaginationError("Invalid cursor.")
+    return [_decode_value(column, value) for column, value in zip(columns, values)]
+
+
+def _decode_value(column, value):
+    # Cursors come from clients: anything but the type the column's own
+    # cursor would hold is rejected before it reaches the driver. Paged
+    # columns are NOT NULL, and a NULL would never compare in _seek.
+    if value is None:
+        raise PaginationError("Invalid cursor.")
+    kind = column.type
+    if isinstance(kind, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise PaginationError("Invalid cursor.")
+    if isinstance(value, bool):
+        raise PaginationError("Invalid cursor.")
+    if isinstance(kind, Integer) and isinstance(value, int):
+        return value
+    if isinstance(kind, Float) and isinstance(value, (int, float)):
+        return value
+    if isinstance(kind, String) and isinstance(value, str):
+        return value
+    raise PaginationError("Invalid cursor.")
+
+
+def _seek(columns, values, descending):
+    # Expanded form of (c1, c2, ...) > (v1, v2, ...) so every term can use
+    # the leading index column on both Postgres and SQLite.
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        step = column < value if descending else column > value
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def keyset_page(query, columns, descending=False, key=None):
+    """Return ``(rows, next_cursor)`` for one page of ``query``.
+
+    ``columns`` are the sort keys, most significant first; none may be NULL
+    and the last one must be unique so the seek is stable. ``key`` maps a row to its sort key values
+    and defaults to reading each column's attribute off the row. Raises
+    ``PaginationError`` on bad input.
+    """
+    limit = parse_limit()
+    cursor = request.args.get("cursor")
+    if cursor:
+        query = query.filter(_seek(columns, decode_cursor(cursor, columns), descending))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, c.key) for c in columns]
+        next_cursor = encode_cursor(values)
+    return rows, next_cursor
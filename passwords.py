@@ -0,0 +1,115 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+logger = logging.getLogger(__name__)
+
+HASH_ALGORITHM = "sha256"
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated or too slow to answer."""
+
+
+def _method(iterations):
+    return f"pbkdf2:{HASH_ALGORITHM}:{iterations}"
+
+
+def hash_iterations(password_hash):
+    """Return the PBKDF2 iteration count recorded in a stored hash, or None
+    if it isn't a PBKDF2 hash using HASH_ALGORITHM."""
+    method = password_hash.split("$", 1)[0].split(":")
+    if method[0] != "pbkdf2" or (len(method) > 1 and method[1] != HASH_ALGORITHM):
+        return None
+    return int(method[2]) if len(method) > 2 else DEFAULT_PBKDF2_ITERATIONS
+
+
+class PasswordHasher:
+    """Runs PBKDF2 off the request threads, on a small process pool.
+
+    At most ``PASSWORD_HASH_QUEUE`` hashes may be queued or running at
+    once. Past that, or when a hash takes longer than
+    ``PASSWORD_HASH_TIMEOUT`` seconds to come back, :class:`HashingBusy` is
+    raised so a burst of logins is turned away quickly. Cheap endpoints
+    keep their workers. ``PASSWORD_HASH_ITERATIONS`` sets the cost of new
+    hashes. With ``PASSWORD_HASH_WORKERS`` set to 0, hashing runs inline on
+    the calling thread.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = None
+        self.rejected = 0
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions["password_hasher"] = self
+        atexit.register(self.close)
+
+    @property
+    def iterations(self):
+        return self._app.config["PASSWORD_HASH_ITERATIONS"]
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, _method(self.iterations))
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_iterations(password_hash) != self.iterations
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        config = self._app.config
+        if not config["PASSWORD_HASH_WORKERS"]:
+            return fn(*args)
+        pool, slots = self._executor()
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy("Password hashing queue is full")
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda f: slots.release())
+        try:
+            return future.result(timeout=config["PASSWORD_HASH_TIMEOUT"])
+        except TimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise HashingBusy("Password hashing timed out") from None
+
+    def _executor(self):
+        with self._lock:
+            # A pool inherited across a fork belongs to the parent.
+            if self._pool is None or self._pid != os.getpid():
+                config = self._app.config
+                self._pool = ProcessPoolExecutor(
+                    max_workers=config["PASSWORD_HASH_WORKERS"],
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._slots = threading.BoundedSemaphore(config["PASSWORD_HASH_QUEUE"])
+                self._pid = os.getpid()
+            return self._pool, self._slots
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,78 @@
+from functools import wraps
+
+from flask import current_app, request
+
+from cache import MemoryCache, cache_from_url
+from metrics import metrics
+from versions import etag_for, versions
+
+# Entries under a replaced stamp are never read again; this only bounds how
+# long they take up space in a shared backend.
+RESPONSE_CACHE_TTL = 300
+
+
+class ResponseCache:
+    """Read-through cache of serialized JSON responses.
+
+    A cached view is keyed by its URL and by the generation of every model
+    it reads, which is the model's version stamp (see ``versions.py``).
+    Committing a change to one of those tables replaces its stamp. Entries
+    built from the old rows are then never looked up again and age out, so
+    invalidation is exact without hooks in the routes. That holds across
+    workers only while the stamps are shared, so nothing is cached when
+    ``versions.shared`` is false. ``RESPONSE_CACHE_URL`` selects the backend:
+
+    - ``memory://`` is per process. It holds at most
+      ``RESPONSE_CACHE_SIZE`` entries and evicts the least recently used.
+    - ``sqlite:///path`` shares entries between the workers on one host.
+
+    Only 200 JSON responses are stored, along with the headers the view
+    set. A hit still honours ``If-None-Match`` against those headers. Hits
+    and misses are exported per endpoint through ``metrics``.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._backend = MemoryCache()
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions["response_cache"] = self
+        self.clear()
+
+    def clear(self):
+        """Drop every entry (memory backend only)."""
+        config = self._app.config
+        self._backend = cache_from_url(config["RESPONSE_CACHE_URL"],
+                                       maxsize=config["RESPONSE_CACHE_SIZE"])
+
+    def cached(self, *models):
+        """Decorate a GET view whose 200 response depends only on the URL
+        and the rows of ``models``."""
+        for model in models:
+            versions.track(model)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not versions.shared:
+                    return view(*args, **kwargs)
+                stamps = versions.stamps(versions.keys(models))
+                key = "response:" + etag_for(request.full_path, *stamps)
+                entry = self._backend.get(key)
+                metrics.response_cache_lookup(request.endpoint, entry is not None)
+                if entry is not None:
+                    body, headers = entry
+                    resp = current_app.response_class(body, headers=headers)
+                    return resp.make_conditional(request)
+                resp = current_app.make_response(view(*args, **kwargs))
+                if resp.status_code == 200 and resp.is_json:
+                    headers = [(k, v) for k, v in resp.headers.items() if k != "Content-Length"]
+                    self._backend.set(key, [resp.get_data(as_text=True), headers],
+                                      RESPONSE_CACHE_TTL)
+                return resp
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
@@ -1,27 +1,80 @@
 import logging
+import re
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import cast, column, false, func, literal_column, table
+from sqlalchemy.orm import selectinload
 
-from models import db, Article, Tag, Category
+from models import db, dialect_insert, Article, Category, Comment, Tag
+from pagination import PaginationError, keyset_page
+from response_cache import response_cache
+from routes.categories import registry as categories
+from versions import versions
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("articles", __name__, url_prefix="/api/articles")
 
 
+def _normalize_tag(name):
+    return " ".join(name.split()).lower()
+
+
 def _parse_tags(tags_raw):
-    return [t.strip() for t in tags_raw.split(",") if t.strip()]
+    names = (_normalize_tag(t) for t in tags_raw.split(","))
+    return list(dict.fromkeys(n for n in names if n))
+
 
 def _resolve_tags(tag_names):
-    tags = []
-    for name in tag_names:
-        tag = Tag.query.filter_by(name=name).first()
-        if not tag:
-            tag = Tag(name=name)
-            db.session.add(tag)
-        tags.append(tag)
-    return tags
+    if not tag_names:
+        return []
+    found = {t.name: t for t in Tag.query.filter(Tag.name.in_(tag_names))}
+    missing = [n for n in tag_names if n not in found]
+    if missing:
+        stmt = (
+            dialect_insert(Tag)
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(Tag)
+        )
+        created = db.session.scalars(stmt, [{"name": n} for n in missing]).all()
+        found.update((t.name, t) for t in created)
+        # Rows a concurrent writer inserted first come back from neither
+        # statement; pick them up with one more lookup.
+        raced = [n for n in missing if n not in found]
+        if raced:
+            found.update((t.name, t) for t in Tag.query.filter(Tag.name.in_(raced)))
+    return [found[n] for n in tag_names]
+
+
+# Category names come from the in-memory registry, not a join.
+_LIST_OPTIONS = (selectinload(Article.tag_objects),)
+
+
+_article_fts = table("article_fts", column("rowid"))
+
+
+def _apply_search(query, q):
+    """Restrict ``query`` to articles matching ``q``; return it with a rank
+    expression where higher is a better match."""
+    if db.engine.dialect.name == "postgresql":
+        vector = literal_column("article.search_vector")
+        tsquery = func.websearch_to_tsquery("english", q)
+        # ts_rank is real; widen it so the float in the cursor compares
+        # equal on the next page. Tests only compile this branch; they run on SQLite.
+        rank = cast(func.ts_rank(vector, tsquery), db.Float(53))
+        return query.filter(vector.op("@@")(tsquery)), rank
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return query.filter(false()), literal_column("0.0", db.Float)
+    # Quote every term so user input can't inject FTS5 query syntax.
+    match = " ".join(f'"{t}"' for t in terms)
+    query = query.join(_article_fts, _article_fts.c.rowid == Article.id).filter(
+        literal_column("article_fts").op("MATCH")(match)
+    )
+    # bm25() is lower-is-better; weight title hits like Postgres weight 'A'.
+    rank = -func.bm25(literal_column("article_fts"), 10.0, 1.0, type_=db.Float)
+    return query, rank
 
 
 def _article_dict(article, include_comments=False):
@@ -33,7 +86,7 @@ def _article_dict(article, include_comments=False):
         "user_id": article.user_id,
         "tags": article.tags,
         "category_id": article.category_id,
-        "category": article.category.name if article.category else None,
+        "category": categories.name(article.category_id),
     }
     if include_comments:
         d["comments"] = [
@@ -51,9 +104,35 @@ def _article_dict(article, include_comments=False):
 
 
 @bp.route("/", methods=["GET"], strict_slashes=False)
+@versions.conditional(Article, Category)
+@response_cache.cached(Article, Tag, Category)
 def list_articles():
-    articles = Article.query.order_by(Article.id).all()
-    return jsonify({"articles": [_article_dict(a) for a in articles]}), 200
+    query = Article.query.options(*_LIST_OPTIONS)
+    tag = _normalize_tag(request.args.get("tag", ""))
+    if tag:
+        query = query.filter(Article.tag_objects.any(Tag.name == tag))
+    category_id = request.args.get("category_id", type=int)
+    if category_id:
+        query = query.filter(Article.category_id == category_id)
+    q = request.args.get("q", "").strip()
+    try:
+        if q:
+            query, rank = _apply_search(query, q)
+            rows, next_cursor = keyset_page(
+                query.add_columns(rank),
+                [rank, Article.id],
+                descending=True,
+                key=lambda row: [row[1], row[0].id],
+            )
+            articles = [row[0] for row in rows]
+        else:
+            articles, next_cursor = keyset_page(query, [Article.id])
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "articles": [_article_dict(a) for a in articles],
+        "next_cursor": next_cursor,
+    }), 200
 
 
 @bp.route("/", methods=["POST"], strict_slashes=False)
@@ -66,8 +145,11 @@ def add():
         return jsonify({"error": "Title is required."}), 400
     tag_names = _parse_tags(data.get("tags", ""))
     category_id = data.get("category_id") or None
-    if category_id and not db.session.get(Category, category_id):
-        return jsonify({"error": "Invalid category."}), 400
+    if category_id:
+        category = categories.get(category_id)
+        if category is None:
+            return jsonify({"error": "Invalid category."}), 400
+        category_id = category["id"]
     article = Article(
         title=title,
         description=description,
@@ -83,8 +165,14 @@ def add():
 
 
 @bp.route("/<int:article_id>", methods=["GET"])
+@versions.conditional(Article, Comment, Category)
+@response_cache.cached(Article, Comment, Tag, Category)
 def detail(article_id):
-    article = db.session.get(Article, article_id)
+    article = db.session.get(
+        Article,
+        article_id,
+        options=[*_LIST_OPTIONS, selectinload(Article.comments)],
+    )
     if not article:
         return jsonify({"error": "Article not found."}), 404
     return jsonify({"article": _article_dict(article, include_comments=True)}), 200
@@ -103,8 +191,11 @@ def update(article_id):
     if not title:
         return jsonify({"error": "Title is required."}), 400
     category_id = data.get("category_id") or None
-    if category_id and not db.session.get(Category, category_id):
-        return jsonify({"error": "Invalid category."}), 400
+    if category_id:
+        category = categories.get(category_id)
+        if category is None:
+            return jsonify({"error": "Invalid category."}), 400
+        category_id = category["id"]
     article.title = title
     article.description = data.get("description", "").strip()
     article.tag_objects = _resolve_tags(_parse_tags(data.get("tags", "")))
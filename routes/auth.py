@@ -3,13 +3,45 @@ import re
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
 
+from cache import LRUCache
 from models import db, User
+from passwords import HashingBusy, hasher
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("auth", __name__, url_prefix="/api")
 
+USER_CACHE_TTL = 60  # seconds other workers may see a stale profile
+# user id -> column values, so authenticated requests needn't load the user.
+user_cache = LRUCache(10000, ttl=USER_CACHE_TTL)
+
+
+def cached_user(user_id):
+    """Return the ``User`` for ``user_id``, from ``user_cache`` when possible.
+
+    A cached user is rebuilt from its column values and merged into the
+    session without a query, so it can still be modified and committed.
+    """
+    fields = user_cache.get(user_id)
+    if fields is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.set(
+                user_id,
+                {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs},
+            )
+        return user
+    user = User(**fields)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _busy():
+    return jsonify({"error": "Server busy, please try again."}), 503, {"Retry-After": "1"}
+
 
 def _user_dict(user):
     return {
@@ -30,7 +62,11 @@ def signup():
     if User.query.filter_by(username=username).first():
         return jsonify({"error": "Username already taken."}), 409
     user = User(username=username)
-    user.set_password(password)
+    try:
+        user.set_password(password)
+    except HashingBusy:
+        logger.warning("Hashing pool busy; rejected signup for %s", username)
+        return _busy()
     db.session.add(user)
     db.session.commit()
     login_user(user)
@@ -44,8 +80,20 @@ def login():
     username = data.get("username", "").strip()
     password = data.get("password", "").strip()
     user = User.query.filter_by(username=username).first()
-    if not user or not user.check_password(password):
-        return jsonify({"error": "Invalid username or password."}), 401
+    try:
+        if not user or not user.check_password(password):
+            return jsonify({"error": "Invalid username or password."}), 401
+    except HashingBusy:
+        logger.warning("Hashing pool busy; rejected login for %s", username)
+        return _busy()
+    if hasher.needs_rehash(user.password_hash):
+        try:
+            user.set_password(password)
+            db.session.commit()
+            user_cache.pop(user.id)
+            logger.info("Rehashed password for %s", username)
+        except HashingBusy:
+            logger.warning("Hashing pool busy; left old hash for %s", username)
     login_user(user)
     logger.info("User %s logged in", username)
     return jsonify({"user": _user_dict(user)}), 200
@@ -93,4 +141,5 @@ def profile_put():
     current_user.full_name = full_name
     current_user.email = email
     db.session.commit()
+    user_cache.pop(current_user.id)
     return jsonify({"user": _user_dict(current_user), "message": "Profile updated."}), 200
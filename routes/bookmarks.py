@@ -4,6 +4,8 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 
 from models import db, Bookmark
+from pagination import PaginationError, keyset_page
+from versions import versions
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +25,20 @@ def _bookmark_dict(bookmark):
 
 @bp.route("/", methods=["GET"], strict_slashes=False)
 @login_required
+@versions.conditional(Bookmark, per_user=True)
 def index():
-    bookmarks = (
-        Bookmark.query.filter_by(user_id=current_user.id)
-        .order_by(Bookmark.created_at.desc())
-        .all()
-    )
-    return jsonify({"bookmarks": [_bookmark_dict(b) for b in bookmarks]}), 200
+    try:
+        bookmarks, next_cursor = keyset_page(
+            Bookmark.query.filter_by(user_id=current_user.id),
+            [Bookmark.created_at, Bookmark.id],
+            descending=True,
+        )
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "bookmarks": [_bookmark_dict(b) for b in bookmarks],
+        "next_cursor": next_cursor,
+    }), 200
 
 
 @bp.route("/", methods=["POST"], strict_slashes=False)
@@ -1,11 +1,102 @@
-from flask import Blueprint, jsonify
+import hashlib
+import json
+import threading
 
-from models import Category
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+
+from models import db, Category
+from response_cache import response_cache
+from versions import versions
 
 bp = Blueprint("categories", __name__, url_prefix="/api/categories")
 
 
+class _Snapshot:
+    def __init__(self, rows, stamp):
+        self.categories = [{"id": id_, "name": name} for id_, name in rows]
+        self.by_id = {c["id"]: c for c in self.categories}
+        body = json.dumps(self.categories, separators=(",", ":"))
+        self.version = hashlib.sha1(body.encode()).hexdigest()[:16]
+        self.stamp = stamp
+
+
+class CategoryRegistry:
+    """Every category, held in memory.
+
+    Categories are a short seeded list that is read on almost every article
+    request. The whole table is loaded once and reused until the shared
+    ``category`` version stamp changes, which happens whenever any worker
+    commits a change to the table (see ``versions.py``). A response keyed
+    on that stamp is therefore never built from an older snapshot.
+    ``version`` is a hash of the contents, so every worker hands out the
+    same ETag for the same list.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self.loads = 0
+
+    def _current(self):
+        stamp, = versions.stamps(versions.keys([Category]))
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.stamp != stamp:
+                # The stamp was read first: rows committed after it only
+                # make this snapshot newer than its stamp, never older.
+                rows = db.session.execute(
+                    select(Category.id, Category.name).order_by(Category.name)
+                ).all()
+                snapshot = self._snapshot = _Snapshot(rows, stamp)
+                self.loads += 1
+            return snapshot
+
+    def listing(self):
+        """Return ``([{"id", "name"}, ...], version)``, ordered by name.
+        The list is shared; don't mutate it."""
+        snapshot = self._current()
+        return snapshot.categories, snapshot.version
+
+    def get(self, category_id):
+        """Return the category for ``category_id`` (an int or numeric
+        string), or None.
+
+        A miss is checked against the database, in case the category was
+        committed but its stamp not yet replaced.
+        """
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None
+        category = self._current().by_id.get(category_id)
+        if category is None and db.session.get(Category, category_id) is not None:
+            self.invalidate()
+            category = self._current().by_id.get(category_id)
+        return category
+
+    def name(self, category_id):
+        category = self._current().by_id.get(category_id) if category_id else None
+        return category["name"] if category else None
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+registry = CategoryRegistry()
+versions.track(Category)
+
+
 @bp.route("/", methods=["GET"], strict_slashes=False)
+@response_cache.cached(Category)
 def list_categories():
-    categories = Category.query.order_by(Category.name).all()
-    return jsonify({"categories": [{"id": c.id, "name": c.name} for c in categories]}), 200
+    categories, version = registry.listing()
+    if request.if_none_match.contains(version):
+        return "", 304, {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    resp = jsonify({"categories": categories})
+    resp.set_etag(version)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp, 200
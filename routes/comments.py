@@ -2,13 +2,156 @@ import logging
 
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import case, func, literal_column, select
+from sqlalchemy.orm import aliased
 
 from models import db, Article, Comment
+from pagination import PaginationError, decode_cursor, encode_cursor, keyset_page, parse_limit
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("comments", __name__, url_prefix="/api/articles/<int:article_id>/comments")
 
+DEFAULT_TREE_DEPTH = 10
+MAX_TREE_DEPTH = 50
+MAX_ID = 2**31 - 1  # upper bound of an integer primary key
+
+
+def _comment_dict(comment):
+    return {
+        "id": comment.id,
+        "author": comment.author,
+        "description": comment.description,
+        "article_id": comment.article_id,
+        "user_id": comment.user_id,
+        "parent_id": comment.parent_id,
+    }
+
+
+def _parse_depth():
+    try:
+        depth = int(request.args.get("depth", DEFAULT_TREE_DEPTH))
+    except ValueError:
+        raise PaginationError("Invalid depth.")
+    if depth < 1:
+        raise PaginationError("Invalid depth.")
+    return min(depth, MAX_TREE_DEPTH)
+
+
+def _load_tree(article_id, parent_id, after_id, depth, limit):
+    """Fetch a page of a comment thread with one recursive CTE.
+
+    The anchor is one page of children of ``parent_id`` (top-level comments
+    when None) and counts as level 1. Each level keeps ``limit + 1`` replies
+    per parent. The extra reply only tells the caller there are more, so its
+    own replies aren't walked. The recursion stops one probe level past
+    ``depth``, which keeps a single reply per parent. Each parent's replies
+    are read as one bounded index range, so the cost follows the page size,
+    not the number of siblings.
+    Returns ``(comment, level)`` rows ordered parents-first.
+    """
+    position = func.row_number().over(order_by=Comment.id)
+    anchor = (
+        select(Comment.id, position.label("position"))
+        .where(
+            Comment.article_id == article_id,
+            Comment.parent_id == parent_id,
+            Comment.id > after_id,
+        )
+        .order_by(Comment.id)
+        .limit(limit + 1)
+        .subquery()
+    )
+    tree = select(
+        anchor.c.id,
+        literal_column("1").label("depth"),
+        case((anchor.c.position > limit, True), else_=False).label("more"),
+    ).cte("comment_tree", recursive=True)
+
+    # The id of the (offset + 1)-th reply to the parent row, found through
+    # ix_comment_parent. It is fixed per parent, so the join below reads
+    # only the replies up to it rather than every sibling.
+    def nth_reply(offset):
+        reply = aliased(Comment)
+        return (
+            select(reply.id)
+            .where(reply.parent_id == tree.c.id)
+            .order_by(reply.id)
+            .limit(1)
+            .offset(offset)
+            .scalar_subquery()
+        )
+
+    cutoff = case((tree.c.depth >= depth, nth_reply(0)), else_=nth_reply(limit))
+    tree = tree.union_all(
+        select(Comment.id, tree.c.depth + 1, case((Comment.id == cutoff, True), else_=False))
+        .select_from(tree)
+        .join(Comment, Comment.parent_id == tree.c.id)
+        .where(
+            tree.c.depth <= depth,
+            ~tree.c.more,
+            Comment.id <= func.coalesce(cutoff, MAX_ID),
+        )
+    )
+    stmt = (
+        select(Comment, tree.c.depth)
+        .join(tree, tree.c.id == Comment.id)
+        .order_by(tree.c.depth, Comment.id)
+    )
+    return db.session.execute(stmt).all()
+
+
+def _build_tree(rows, root_parent_id, depth, limit):
+    nodes = {}
+    children = {}
+    for comment, level in rows:
+        node = _comment_dict(comment)
+        node["replies"] = []
+        node["next_cursor"] = None
+        nodes[comment.id] = (node, level)
+        children.setdefault(comment.parent_id, []).append(comment.id)
+
+    def attach(parent_id, level):
+        ids = children.get(parent_id, [])
+        if level > depth:
+            # Probe level: only report that replies exist.
+            return [], encode_cursor([0]) if ids else None
+        page = ids[:limit]
+        next_cursor = encode_cursor([page[-1]]) if len(ids) > limit else None
+        out = []
+        for comment_id in page:
+            node, _ = nodes[comment_id]
+            node["replies"], node["next_cursor"] = attach(comment_id, level + 1)
+            out.append(node)
+        return out, next_cursor
+
+    return attach(root_parent_id, 1)
+
+
+@bp.route("/", methods=["GET"], strict_slashes=False)
+def index(article_id):
+    if not db.session.get(Article, article_id):
+        return jsonify({"error": "Article not found."}), 404
+    try:
+        if request.args.get("tree") not in ("1", "true"):
+            comments, next_cursor = keyset_page(
+                Comment.query.filter_by(article_id=article_id), [Comment.id]
+            )
+            return jsonify({
+                "comments": [_comment_dict(c) for c in comments],
+                "next_cursor": next_cursor,
+            }), 200
+        limit = parse_limit()
+        depth = _parse_depth()
+        parent_id = request.args.get("parent_id", type=int)
+        cursor = request.args.get("cursor")
+        after_id = decode_cursor(cursor, [Comment.id])[0] if cursor else 0
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = _load_tree(article_id, parent_id, after_id, depth, limit)
+    comments, next_cursor = _build_tree(rows, parent_id, depth, limit)
+    return jsonify({"comments": comments, "next_cursor": next_cursor}), 200
+
 
 @bp.route("/", methods=["POST"], strict_slashes=False)
 @login_required
@@ -35,16 +178,7 @@ def add(article_id):
     db.session.add(comment)
     db.session.commit()
     logger.info("Added comment %d to article %d", comment.id, article_id)
-    return jsonify({
-        "comment": {
-            "id": comment.id,
-            "author": comment.author,
-            "description": comment.description,
-            "article_id": comment.article_id,
-            "user_id": comment.user_id,
-            "parent_id": comment.parent_id,
-        }
-    }), 201
+    return jsonify({"comment": _comment_dict(comment)}), 201
 
 
 @bp.route("/<int:comment_id>", methods=["DELETE"])
@@ -1,27 +1,137 @@
+import atexit
+import hashlib
+import heapq
 import json
 import logging
+import random
+import re
+import threading
 import time
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
 
 from flask import Blueprint, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import select
+
+from breaker import CircuitBreaker
+from cache import MemoryCache, cache_from_url
+from httpclient import HTTPClient
+from models import db, FeedSubscription
+from versions import etag_for
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("feeds", __name__, url_prefix="/api/feeds")
 
-SUBREDDITS = ["leadership", "management", "MachineLearning", "artificial"]
+# Served to anonymous users and to anyone without subscriptions.
+SUBREDDITS = ["leadership", "management", "machinelearning", "artificial"]
+SUBREDDIT_RE = re.compile(r"^[a-z0-9_]{2,21}$")
+MAX_SUBSCRIPTIONS = 50
+FEED_SIZE = 50
+UPSTREAM_URL = "https://www.reddit.com"
 CACHE_TTL = 300  # 5 minutes
-_cache = {}
+FETCH_TIMEOUT = 10  # per upstream request
+FETCH_DEADLINE = 5  # for the whole fan-out
+FETCH_WORKERS = 8
+STALE_TTL = 3600  # how long past expiry stale posts may still be served
+REFRESH_LEASE_TTL = 10  # lets one worker at a time revalidate a stale entry
+SOURCE_TTL = 86400  # how long validators are kept for conditional refetches
+PREFETCH_INTERVAL = 5  # how often the prefetcher looks for entries to refresh
+PREFETCH_LEAD = 30  # refresh this long before an entry expires...
+PREFETCH_JITTER = 60  # ...plus a random extra so refreshes don't line up
+PREFETCH_IDLE_TTL = 3600  # stop prefetching what nobody has asked for lately
+_cache = MemoryCache()
+_http = HTTPClient(
+    UPSTREAM_URL,
+    max_connections=FETCH_WORKERS,
+    timeout=FETCH_TIMEOUT,
+    headers={"User-Agent": "claude-project-feeds/1.0"},
+)
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="feeds")
+_inflight = {}
+_inflight_lock = threading.Lock()
+_sources = {}
+_sources_lock = threading.Lock()
 
 
-def _fetch_subreddit(subreddit, sort):
-    url = f"https://www.reddit.com/r/{subreddit}/{sort}.json?limit=15"
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "claude-project-feeds/1.0"},
-    )
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        data = json.loads(resp.read().decode())
+class FeedUnavailable(Exception):
+    pass
+
+
+class _Source:
+    """Circuit breaker and refresh counters for one subreddit."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.last_error = None
+        self.last_success = None
+
+    def record(self, duration, error=None):
+        with self._lock:
+            self.refreshes += 1
+            self.last_duration = duration
+            self.total_duration += duration
+            if error is None:
+                self.last_success = time.time()
+            else:
+                self.failures += 1
+                self.last_error = str(error)
+        if error is None:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def as_dict(self):
+        retry_at = self.breaker.retry_at
+        return {
+            "state": self.breaker.state,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "consecutive_failures": self.breaker.failures,
+            "last_duration_ms": _ms(self.last_duration),
+            "avg_duration_ms": _ms(self.total_duration / self.refreshes)
+            if self.refreshes else None,
+            "last_error": self.last_error,
+            "last_success": self.last_success,
+            "retry_in": max(0.0, retry_at - time.monotonic()) if retry_at else None,
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _source(subreddit):
+    with _sources_lock:
+        source = _sources.get(subreddit)
+        if source is None:
+            source = _sources[subreddit] = _Source()
+        return source
+
+
+@bp.record_once
+def _configure(state):
+    global _cache
+    _cache = cache_from_url(state.app.config["FEED_CACHE_URL"])
+    prefetcher.init_app(state.app)
+
+
+def _source_key(subreddit, sort):
+    return f"feeds:{sort}:{subreddit}"
+
+
+def _score(post):
+    return post["score"]
+
+
+def _parse_posts(body, subreddit):
+    data = json.loads(body.decode())
     posts = []
     for child in data.get("data", {}).get("children", []):
         p = child.get("data", {})
@@ -40,36 +150,306 @@ def _fetch_subreddit(subreddit, sort):
                 "selftext": selftext[:300],
             }
         )
+    # Kept in merge order so feeds can be assembled with heapq.merge.
+    posts.sort(key=_score, reverse=True)
     return posts
 
 
+def _load(subreddit, sort):
+    """Fetch one subreddit listing, revalidating the last copy if we have one.
+
+    The posts are cached with the upstream ``ETag``/``Last-Modified`` so the
+    next fetch can be conditional; a 304 just extends the cached copy.
+    """
+    key = _source_key(subreddit, sort)
+    previous = _cache.get(key)
+    headers = {}
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+    status, resp_headers, body = _http.get(f"/r/{subreddit}/{sort}.json?limit=15", headers)
+    if status == 304 and previous:
+        entry = dict(previous, expires=time.time() + CACHE_TTL)
+    elif status == 200:
+        entry = {
+            "expires": time.time() + CACHE_TTL,
+            "etag": resp_headers.get("etag"),
+            "last_modified": resp_headers.get("last-modified"),
+            "version": hashlib.sha1(body).hexdigest()[:16],
+            "posts": _parse_posts(body, subreddit),
+        }
+    else:
+        raise FeedUnavailable(f"r/{subreddit} returned HTTP {status}")
+    _cache.set(key, entry, CACHE_TTL + SOURCE_TTL)
+    return entry
+
+
+def _timed_load(subreddit, sort):
+    source = _source(subreddit)
+    start = time.monotonic()
+    try:
+        entry = _load(subreddit, sort)
+    except Exception as e:
+        source.record(time.monotonic() - start, e)
+        raise
+    source.record(time.monotonic() - start)
+    return entry
+
+
+def _refresh(subreddit, sort):
+    """Start a refresh of one subreddit unless one is already running, and
+    return the Future of the in-flight refresh. Returns None when the
+    subreddit's circuit breaker is open."""
+    key = (subreddit, sort)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        if not _source(subreddit).breaker.allow():
+            return None
+        future = _executor.submit(_timed_load, subreddit, sort)
+        _inflight[key] = future
+
+    def done(f):
+        with _inflight_lock:
+            if _inflight.get(key) is f:
+                del _inflight[key]
+        if f.exception() is not None:
+            logger.warning("Refresh of r/%s (%s) failed: %s", subreddit, sort, f.exception())
+
+    future.add_done_callback(done)
+    return future
+
+
+def _gather(subreddits, sort):
+    """Return the cached entry to serve for each of ``subreddits``.
+
+    Fresh copies are used as-is. Copies less than STALE_TTL past expiry are
+    used while a background refresh runs. Anything else is refreshed (one
+    shared fetch per subreddit) and waited on until FETCH_DEADLINE, falling
+    back to a stale copy if the refresh fails or runs late. Subreddits whose
+    circuit breaker is open are not waited on at all. Raises
+    ``FeedUnavailable`` when no subreddit has anything to serve.
+    """
+    now = time.time()
+    entries = []
+    waiting = {}
+    for subreddit in subreddits:
+        prefetcher.touch(subreddit, sort)
+        key = _source_key(subreddit, sort)
+        cached = _cache.get(key)
+        if cached and now < cached["expires"]:
+            entries.append(cached)
+        elif cached and now < cached["expires"] + STALE_TTL:
+            # With a shared backend, only the worker holding the lease refreshes.
+            if _cache.add(key + ":refresh", True, REFRESH_LEASE_TTL):
+                _refresh(subreddit, sort)
+            entries.append(cached)
+        else:
+            future = _refresh(subreddit, sort)
+            if future is not None:
+                waiting[future] = (subreddit, cached)
+            elif cached:
+                entries.append(cached)
+    if waiting:
+        done, _ = wait(waiting, timeout=FETCH_DEADLINE)
+        for future, (subreddit, cached) in waiting.items():
+            if future in done and future.exception() is None:
+                entries.append(future.result())
+            elif cached:
+                logger.warning("Serving stale r/%s (%s)", subreddit, sort)
+                entries.append(cached)
+            elif future not in done:
+                logger.warning("r/%s missed the %ss feed deadline", subreddit, FETCH_DEADLINE)
+    if not entries and subreddits:
+        raise FeedUnavailable("No feed data available")
+    return entries
+
+
+def _merge(entries, limit=FEED_SIZE):
+    lists = [entry["posts"] for entry in entries]
+    return list(islice(heapq.merge(*lists, key=_score, reverse=True), limit))
+
+
+def _get_posts(subreddits, sort, limit=FEED_SIZE):
+    """Return the top ``limit`` posts across ``subreddits`` by score.
+
+    Each subreddit is cached on its own and shared by every feed that
+    includes it (see ``_gather``); the per-subreddit lists are heap-merged.
+    """
+    return _merge(_gather(subreddits, sort), limit)
+
+
+class FeedPrefetcher:
+    """Refreshes recently requested subreddits before their entries expire.
+
+    Every (subreddit, sort) pair served by ``_gather`` is tracked until it
+    has gone unrequested for ``idle_ttl`` seconds. Every ``interval``
+    seconds a background thread refreshes the tracked pairs that expire
+    within ``lead`` seconds plus a random jitter of up to ``jitter``
+    seconds, redrawn after each refresh. Refreshes go through the same
+    single-flight, lease and circuit breaker as the request path, so
+    requests rarely wait on the network. Under ``TESTING`` no thread is
+    started and tests call :meth:`run_once` themselves.
+    """
+
+    def __init__(self, interval=PREFETCH_INTERVAL, lead=PREFETCH_LEAD,
+                 jitter=PREFETCH_JITTER, idle_ttl=PREFETCH_IDLE_TTL, clock=time.time):
+        self.interval = interval
+        self.lead = lead
+        self.jitter = jitter
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._active = {}
+        self._offsets = {}
+        self._lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.runs = 0
+        self.started = 0
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions["feed_prefetcher"] = self
+        atexit.register(self.close)
+
+    def touch(self, subreddit, sort):
+        with self._lock:
+            self._active[(subreddit, sort)] = self._clock()
+            if self._thread is None and self._app is not None and not self._app.testing:
+                self._thread = threading.Thread(
+                    target=self._run, name="feed-prefetcher", daemon=True
+                )
+                self._thread.start()
+
+    def run_once(self):
+        """Start refreshes for every tracked pair that is due; return how
+        many were started."""
+        now = self._clock()
+        with self._lock:
+            for pair, seen in list(self._active.items()):
+                if now - seen > self.idle_ttl:
+                    del self._active[pair]
+                    self._offsets.pop(pair, None)
+            pairs = list(self._active)
+        started = 0
+        for subreddit, sort in pairs:
+            key = _source_key(subreddit, sort)
+            cached = _cache.get(key)
+            offset = self._offsets.setdefault(
+                (subreddit, sort), random.uniform(0, self.jitter)
+            )
+            if cached and now < cached["expires"] - self.lead - offset:
+                continue
+            if not _cache.add(key + ":refresh", True, REFRESH_LEASE_TTL):
+                continue
+            if _refresh(subreddit, sort) is not None:
+                self._offsets.pop((subreddit, sort), None)
+                started += 1
+        self.runs += 1
+        self.started += started
+        return started
+
+    def as_dict(self):
+        with self._lock:
+            tracked = len(self._active)
+        return {"tracked": tracked, "runs": self.runs, "started": self.started}
+
+    def clear(self):
+        with self._lock:
+            self._active.clear()
+            self._offsets.clear()
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Feed prefetch failed")
+
+
+prefetcher = FeedPrefetcher()
+
+
+def _normalize_subreddit(name):
+    name = str(name).strip().lower()
+    if name.startswith("r/"):
+        name = name[2:]
+    return name
+
+
+def _subscriptions(user_id):
+    return list(
+        db.session.scalars(
+            select(FeedSubscription.subreddit)
+            .where(FeedSubscription.user_id == user_id)
+            .order_by(FeedSubscription.id)
+        )
+    )
+
+
 @bp.route("/", methods=["GET"], strict_slashes=False)
 def list_feeds():
     sort = request.args.get("sort", "hot")
     if sort not in ("hot", "new", "top"):
         sort = "hot"
 
-    cache_key = sort
-    cached = _cache.get(cache_key)
-    if cached and time.time() - cached["time"] < CACHE_TTL:
-        return jsonify({"posts": cached["posts"]}), 200
-
-    all_posts = []
+    subreddits = None
+    if current_user.is_authenticated:
+        subreddits = _subscriptions(current_user.id)
     try:
-        for sub in SUBREDDITS:
-            try:
-                all_posts.extend(_fetch_subreddit(sub, sort))
-            except Exception:
-                logger.warning("Failed to fetch r/%s", sub)
-        if not all_posts:
-            raise Exception("All subreddit fetches failed")
-    except Exception:
+        entries = _gather(subreddits or SUBREDDITS, sort)
+    except FeedUnavailable:
         logger.exception("Failed to fetch feeds")
         return jsonify({"error": "Failed to fetch feeds."}), 502
+    # The feed is a pure function of the entries merged into it.
+    etag = etag_for(sort, *(e.get("version") or e["expires"] for e in entries))
+    if request.if_none_match.contains(etag):
+        return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    resp = jsonify({"posts": _merge(entries)})
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp, 200
+
 
-    all_posts.sort(key=lambda p: p["score"], reverse=True)
-    top_posts = all_posts[:50]
+@bp.route("/status", methods=["GET"])
+def status():
+    with _sources_lock:
+        sources = {name: source.as_dict() for name, source in sorted(_sources.items())}
+    return jsonify({"sources": sources, "prefetch": prefetcher.as_dict()}), 200
 
-    _cache[cache_key] = {"time": time.time(), "posts": top_posts}
 
-    return jsonify({"posts": top_posts}), 200
+@bp.route("/subscriptions", methods=["GET"])
+@login_required
+def get_subscriptions():
+    subreddits = _subscriptions(current_user.id)
+    return jsonify({"subreddits": subreddits, "default": SUBREDDITS}), 200
+
+
+@bp.route("/subscriptions", methods=["PUT"])
+@login_required
+def put_subscriptions():
+    data = request.get_json() or {}
+    names = data.get("subreddits")
+    if not isinstance(names, list):
+        return jsonify({"error": "subreddits must be a list."}), 400
+    subreddits = list(dict.fromkeys(_normalize_subreddit(n) for n in names))
+    invalid = [s for s in subreddits if not SUBREDDIT_RE.match(s)]
+    if invalid:
+        return jsonify({"error": f"Invalid subreddit: {invalid[0]}"}), 400
+    if len(subreddits) > MAX_SUBSCRIPTIONS:
+        return jsonify({"error": f"At most {MAX_SUBSCRIPTIONS} subreddits."}), 400
+
+    FeedSubscription.query.filter_by(user_id=current_user.id).delete()
+    db.session.add_all(
+        FeedSubscription(user_id=current_user.id, subreddit=s) for s in subreddits
+    )
+    db.session.commit()
+    logger.info("User %d subscribed to %d subreddits", current_user.id, len(subreddits))
+    return jsonify({"subreddits": subreddits, "default": SUBREDDITS}), 200
@@ -1,23 +1,37 @@
 import logging
-import random
-import string
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 
-from models import db, ShortUrl
+from cache import LRUCache
+from clicks import click_counter
+from models import db, ClickRollup, ShortUrl
+from shortcodes import allocator
+from pagination import PaginationError, keyset_page
+from versions import versions
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("shortener", __name__, url_prefix="/api/shortener")
 
+REDIRECT_CACHE_SIZE = 10000
+# The cache is per worker and a delete only evicts its own worker's entry, so
+# another worker may keep redirecting a deleted code for up to this long (its
+# clicks are dropped at flush). A new code can likewise 404 for up to
+# REDIRECT_NEGATIVE_TTL on a worker that looked it up before it existed.
+REDIRECT_CACHE_TTL = 30
+REDIRECT_NEGATIVE_TTL = 30
+# short_code -> (id, original_url), or None for codes known not to exist.
+redirect_cache = LRUCache(REDIRECT_CACHE_SIZE, ttl=REDIRECT_CACHE_TTL)
 
-def _generate_short_code(length=6):
-    chars = string.ascii_letters + string.digits
-    while True:
-        code = "".join(random.choices(chars, k=length))
-        if not ShortUrl.query.filter_by(short_code=code).first():
-            return code
+
+MAX_CODE_ATTEMPTS = 5
+
+
+def _generate_short_code():
+    return allocator.allocate(current_app.config["SHORT_CODE_LENGTH"])
 
 
 def _short_url_dict(short_url):
@@ -26,21 +40,29 @@ def _short_url_dict(short_url):
         "short_code": short_url.short_code,
         "original_url": short_url.original_url,
         "short_url": f"/s/{short_url.short_code}",
-        "click_count": short_url.click_count,
+        "click_count": (short_url.click_count or 0) + click_counter.pending(short_url.id),
         "user_id": short_url.user_id,
         "created_at": short_url.created_at.isoformat() if short_url.created_at else None,
     }
 
 
+# Click counts include this worker's unflushed clicks, hence the extra.
 @bp.route("/", methods=["GET"], strict_slashes=False)
 @login_required
+@versions.conditional(ShortUrl, per_user=True, extra=lambda: click_counter.recorded)
 def index():
-    urls = (
-        ShortUrl.query.filter_by(user_id=current_user.id)
-        .order_by(ShortUrl.created_at.desc())
-        .all()
-    )
-    return jsonify({"short_urls": [_short_url_dict(u) for u in urls]}), 200
+    try:
+        urls, next_cursor = keyset_page(
+            ShortUrl.query.filter_by(user_id=current_user.id),
+            [ShortUrl.created_at, ShortUrl.id],
+            descending=True,
+        )
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "short_urls": [_short_url_dict(u) for u in urls],
+        "next_cursor": next_cursor,
+    }), 200
 
 
 @bp.route("/", methods=["POST"], strict_slashes=False)
@@ -52,13 +74,24 @@ def add():
     if not original_url:
         return jsonify({"error": "URL is required."}), 400
 
-    short_url = ShortUrl(
-        short_code=_generate_short_code(),
-        original_url=original_url,
-        user_id=current_user.id,
-    )
-    db.session.add(short_url)
-    db.session.commit()
+    # Allocated codes never repeat, but may still hit a code issued before
+    # the allocator existed; just move on to the next one.
+    for _ in range(MAX_CODE_ATTEMPTS):
+        short_url = ShortUrl(
+            short_code=_generate_short_code(),
+            original_url=original_url,
+            user_id=current_user.id,
+        )
+        db.session.add(short_url)
+        try:
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            logger.warning("Short code %s already taken", short_url.short_code)
+    else:
+        return jsonify({"error": "Could not allocate a short code."}), 503
+    redirect_cache.pop(short_url.short_code)
     logger.info("Created short URL %s -> %s", short_url.short_code, original_url)
     return jsonify({"short_url": _short_url_dict(short_url)}), 201
 
@@ -73,5 +106,54 @@ def delete(short_url_id):
         return jsonify({"error": "Not authorized."}), 403
     db.session.delete(short_url)
     db.session.commit()
+    redirect_cache.pop(short_url.short_code)
     logger.info("Deleted short URL %d", short_url_id)
     return jsonify({"message": "Short URL deleted."}), 200
+
+
+@bp.route("/<int:short_url_id>/stats", methods=["GET"])
+@login_required
+def stats(short_url_id):
+    short_url = db.session.get(ShortUrl, short_url_id)
+    if not short_url:
+        return jsonify({"error": "Short URL not found."}), 404
+    if short_url.user_id != current_user.id:
+        return jsonify({"error": "Not authorized."}), 403
+    granularity = request.args.get("granularity", "hour")
+    if granularity not in ("hour", "day"):
+        return jsonify({"error": "Invalid granularity."}), 400
+
+    def grouped(*columns):
+        return db.session.execute(
+            select(*columns, func.sum(ClickRollup.clicks))
+            .where(ClickRollup.short_url_id == short_url_id)
+            .group_by(*columns)
+        ).all()
+
+    # Compacted history only exists as daily rows, so an hourly series
+    # shows those days as single points.
+    series = {}
+    for row_granularity, bucket, clicks in grouped(ClickRollup.granularity, ClickRollup.bucket):
+        if granularity == "day" and row_granularity == "hour":
+            bucket = bucket.replace(hour=0)
+        series[bucket] = series.get(bucket, 0) + clicks
+    referrers = grouped(ClickRollup.referrer)
+    agents = grouped(ClickRollup.agent)
+    return jsonify({
+        "stats": {
+            "total": sum(series.values()),
+            "granularity": granularity,
+            "series": [
+                {"bucket": bucket.isoformat(), "clicks": clicks}
+                for bucket, clicks in sorted(series.items())
+            ],
+            "referrers": [
+                {"referrer": referrer, "clicks": clicks}
+                for referrer, clicks in sorted(referrers, key=lambda r: -r[1])
+            ],
+            "agents": [
+                {"agent": agent, "clicks": clicks}
+                for agent, clicks in sorted(agents, key=lambda r: -r[1])
+            ],
+        }
+    }), 200
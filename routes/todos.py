@@ -4,6 +4,8 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 
 from models import db, Todo
+from pagination import PaginationError, keyset_page
+from versions import versions
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +23,16 @@ def _todo_dict(todo):
 
 
 @bp.route("/", methods=["GET"], strict_slashes=False)
+@versions.conditional(Todo)
 def index():
-    todos = Todo.query.order_by(Todo.id).all()
-    return jsonify({"todos": [_todo_dict(t) for t in todos]}), 200
+    try:
+        todos, next_cursor = keyset_page(Todo.query, [Todo.id])
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "todos": [_todo_dict(t) for t in todos],
+        "next_cursor": next_cursor,
+    }), 200
 
 
 @bp.route("/", methods=["POST"], strict_slashes=False)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import string
+import threading
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ShortCodeCounter, ShortUrl
+
+ALPHABET = string.ascii_letters + string.digits
+BLOCK_SIZE = 100
+FEISTEL_ROUNDS = 4
+
+
+def encode_base62(number, length):
+    chars = []
+    for _ in range(length):
+        number, rem = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+class ShortCodeAllocator:
+    """Hands out unique short codes without checking the table first.
+
+    Each process reserves a block of sequence numbers with one atomic
+    UPDATE on ``short_code_counter`` and then allocates from that block in
+    memory. A number is turned into a code by a keyed Feistel permutation
+    over the ``62 ** length`` keyspace, so distinct numbers always give
+    distinct codes that do not look sequential. The key must never change
+    once codes have been issued.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.key = None
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+
+    def init_app(self, app):
+        length = app.config["SHORT_CODE_LENGTH"]
+        column = ShortUrl.__table__.c.short_code.type.length
+        if not 1 <= length <= column:
+            raise ValueError(f"SHORT_CODE_LENGTH must be between 1 and {column}, not {length}.")
+        self.key = hashlib.sha256(app.config["SHORT_CODE_KEY"].encode()).digest()
+        app.extensions["short_code_allocator"] = self
+
+    def reset(self):
+        with self._lock:
+            self._next = self._end = 0
+
+    def allocate(self, length):
+        space = len(ALPHABET) ** length
+        number = self._next_number()
+        if number >= space:
+            raise RuntimeError(f"Short code keyspace of length {length} is exhausted.")
+        return encode_base62(self._permute(number, space), length)
+
+    def _next_number(self):
+        with self._lock:
+            # A forked worker must not reuse the block its parent reserved.
+            if self._pid != os.getpid() or self._next >= self._end:
+                self._end = self._reserve_block()
+                self._next = self._end - self.block_size
+                self._pid = os.getpid()
+            number = self._next
+            self._next += 1
+            return number
+
+    def _reserve_block(self):
+        table = ShortCodeCounter.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == 1)
+            .values(next_value=table.c.next_value + self.block_size)
+            .returning(table.c.next_value)
+        )
+        # Runs in its own transaction so a rolled-back request never hands
+        # its block back for another worker to reuse.
+        while True:
+            with db.engine.begin() as conn:
+                end = conn.execute(stmt).scalar()
+                if end is not None:
+                    return end
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(table).values(id=1, next_value=self.block_size))
+                return self.block_size
+            except IntegrityError:
+                continue
+
+    def _permute(self, number, space):
+        half = ((space - 1).bit_length() + 1) // 2
+        while True:
+            number = self._feistel(number, half)
+            if number < space:
+                return number
+
+    def _feistel(self, number, half):
+        mask = (1 << half) - 1
+        left, right = number >> half, number & mask
+        for round_ in range(FEISTEL_ROUNDS):
+            digest = hashlib.blake2b(
+                f"{round_}:{right}".encode(), key=self.key, digest_size=8
+            ).digest()
+            left, right = right, left ^ (int.from_bytes(digest, "big") & mask)
+        return (left << half) | right
+
+
+allocator = ShortCodeAllocator()
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from flask import Response, jsonify, request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional; only needed to build .br files
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Vite emits content-hashed files such as assets/index-B1a2C3d4.js.
+FINGERPRINTED = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferred first when the client accepts several equally.
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE = (".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".map", ".xml")
+MIN_COMPRESS_SIZE = 512
+
+
+class _Asset:
+    def __init__(self, path, etag, immutable):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = etag
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        self.encoded = {}  # encoding -> path of the precompressed sibling
+
+
+class AssetManifest:
+    """In-memory index of the built frontend (``frontend/dist``).
+
+    The tree is scanned once by :meth:`load`, so requests do no filesystem
+    lookups. Fingerprinted Vite assets are sent with an immutable one-year
+    ``Cache-Control``. Everything else must revalidate against its ETag.
+    When the client accepts them, ``.br``/``.gz`` siblings built by
+    ``flask compress-assets`` are served in place of the original.
+    ``index.html``, which is the response for every client-side route, is
+    held in memory along with its compressed forms. Rebuilding the
+    frontend needs a restart (or another :meth:`load`).
+    """
+
+    def __init__(self):
+        self.root = None
+        self._assets = {}
+        self._index = None
+
+    def load(self, root):
+        self.root = root
+        self._assets = {}
+        self._index = None
+        if not os.path.isdir(root):
+            logger.warning("Frontend build %s not found; serving API only", root)
+            return
+        siblings = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith((".br", ".gz")):
+                    siblings.append(name)
+                    continue
+                with open(path, "rb") as f:
+                    etag = hashlib.sha1(f.read()).hexdigest()[:20]
+                self._assets[name] = _Asset(path, etag, bool(FINGERPRINTED.match(name)))
+        for name in siblings:
+            asset = self._assets.get(name[:-3])
+            if asset is not None:
+                encoding = "br" if name.endswith(".br") else "gzip"
+                asset.encoded[encoding] = os.path.join(root, name)
+        index = self._assets.pop("index.html", None)
+        if index is not None:
+            self._index = _load_index(index)
+        logger.info("Loaded %d frontend assets from %s", len(self._assets), root)
+
+    def __contains__(self, name):
+        return name in self._assets
+
+    def response(self, path):
+        """Serve ``path`` from the manifest, or ``index.html`` for anything
+        else so client-side routes work."""
+        asset = self._assets.get(path)
+        if asset is None:
+            return self._index_response()
+        encoding = _negotiate(asset.encoded)
+        if encoding:
+            resp = send_file(asset.encoded[encoding], mimetype=asset.mimetype,
+                             etag=f"{asset.etag}-{encoding}", conditional=True)
+            resp.headers["Content-Encoding"] = encoding
+        else:
+            resp = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag,
+                             conditional=True)
+        if asset.encoded:
+            resp.vary.add("Accept-Encoding")
+        resp.headers["Cache-Control"] = asset.cache_control
+        return resp
+
+    @property
+    def index_html(self):
+        """The built ``index.html`` as text, or None if there is no build."""
+        return self._index[0]["identity"].decode() if self._index else None
+
+    @property
+    def index_etag(self):
+        return self._index[1] if self._index else None
+
+    def html_response(self, bodies, etag, cache_control=REVALIDATE):
+        """Answer with one of ``bodies`` (encoding -> bytes, including
+        ``identity``), honouring Accept-Encoding and If-None-Match."""
+        encoding = _negotiate(bodies)
+        resp = Response(bodies[encoding or "identity"], mimetype="text/html")
+        resp.set_etag(f"{etag}-{encoding}" if encoding else etag)
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        if len(bodies) > 1:
+            resp.vary.add("Accept-Encoding")
+        resp.headers["Cache-Control"] = cache_control
+        return resp.make_conditional(request)
+
+    def _index_response(self):
+        if self._index is None:
+            return jsonify({"error": "Frontend not built."}), 404
+        return self.html_response(*self._index)
+
+
+def _load_index(asset):
+    with open(asset.path, "rb") as f:
+        body = f.read()
+    bodies = {"identity": body}
+    for encoding, path in asset.encoded.items():
+        with open(path, "rb") as f:
+            bodies[encoding] = f.read()
+    bodies.setdefault("gzip", gzip_bytes(body))
+    return bodies, asset.etag
+
+
+def gzip_bytes(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _negotiate(available):
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding, _ in ENCODINGS:
+        quality = accepted[encoding]
+        if encoding in available and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_tree(root):
+    """Write ``.gz`` (and, with ``brotli`` installed, ``.br``) siblings for
+    the compressible files under ``root``; return how many were written."""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            outputs = {".gz": gzip_bytes(data)}
+            if brotli is not None:
+                outputs[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in outputs.items():
+                if len(compressed) < len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+
+assets = AssetManifest()
@@ -1,5 +1,20 @@
-from conftest import login
-from models import Article
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+
+from conftest import count_queries, login
+from models import Article, Category, Comment, Tag
+from pagination import encode_cursor
+
+
+def _seed_articles(db, count):
+    category = Category(name="Science")
+    tags = [Tag(name="a"), Tag(name="b")]
+    for i in range(count):
+        db.session.add(
+            Article(title=f"Art {i}", author="a", category=category, tag_objects=tags)
+        )
+    db.session.commit()
+    db.session.expunge_all()
 
 
 class TestArticleList:
@@ -16,6 +31,115 @@ class TestArticleList:
         assert len(articles) == 1
         assert articles[0]["title"] == "Test Article"
 
+    def test_list_query_count_is_constant(self, client, db):
+        _seed_articles(db, 20)
+        client.get("/api/categories")  # warm the category registry
+        with count_queries(db) as queries:
+            resp = client.get("/api/articles")
+        articles = resp.get_json()["articles"]
+        assert len(articles) == 20
+        assert articles[0]["tags"] == ["a", "b"]
+        assert articles[0]["category"] == "Science"
+        assert len(queries) <= 2
+
+    def test_list_paginates_by_id(self, client, db):
+        _seed_articles(db, 3)
+        resp = client.get("/api/articles?limit=2")
+        first = resp.get_json()
+        assert [a["title"] for a in first["articles"]] == ["Art 0", "Art 1"]
+        resp = client.get(f"/api/articles?limit=2&cursor={first['next_cursor']}")
+        second = resp.get_json()
+        assert [a["title"] for a in second["articles"]] == ["Art 2"]
+        assert second["next_cursor"] is None
+
+
+class TestArticleSearch:
+    def _add(self, db, title, description="", **kwargs):
+        art = Article(title=title, description=description, author="a", **kwargs)
+        db.session.add(art)
+        db.session.commit()
+        return art
+
+    def test_search_matches_title_and_description(self, client, db):
+        self._add(db, "Gardening tips", "Growing tomatoes")
+        self._add(db, "Cooking", "How to roast tomatoes")
+        self._add(db, "Unrelated", "Nothing here")
+        resp = client.get("/api/articles?q=tomatoes")
+        assert resp.status_code == 200
+        titles = {a["title"] for a in resp.get_json()["articles"]}
+        assert titles == {"Gardening tips", "Cooking"}
+
+    def test_search_ranks_title_matches_first(self, client, db):
+        self._add(db, "Notes", "a short mention of python")
+        self._add(db, "Python", "all about the language")
+        resp = client.get("/api/articles?q=python")
+        titles = [a["title"] for a in resp.get_json()["articles"]]
+        assert titles == ["Python", "Notes"]
+
+    def test_search_sees_updates_and_deletes(self, client, db):
+        art = self._add(db, "Old title")
+        art.title = "Fresh title"
+        db.session.commit()
+        assert client.get("/api/articles?q=old").get_json()["articles"] == []
+        assert len(client.get("/api/articles?q=fresh").get_json()["articles"]) == 1
+        db.session.delete(art)
+        db.session.commit()
+        assert client.get("/api/articles?q=fresh").get_json()["articles"] == []
+
+    def test_search_ignores_query_syntax(self, client, db):
+        self._add(db, "Quotes", "say \"hello\"")
+        resp = client.get('/api/articles?q=hello" (*')
+        assert resp.status_code == 200
+        assert len(resp.get_json()["articles"]) == 1
+
+    def test_search_combines_with_tag_and_category(self, client, db):
+        science = Category(name="Science")
+        tag = Tag(name="space")
+        self._add(db, "Rockets", category=science, tag_objects=[tag])
+        self._add(db, "Rockets again", category=science)
+        self._add(db, "Rockets elsewhere", tag_objects=[tag])
+        db.session.commit()
+        resp = client.get(f"/api/articles?q=rockets&tag=space&category_id={science.id}")
+        titles = [a["title"] for a in resp.get_json()["articles"]]
+        assert titles == ["Rockets"]
+
+    def test_search_paginates(self, client, db):
+        for i in range(3):
+            self._add(db, f"Topic {i}", "topic " * (i + 1))
+        resp = client.get("/api/articles?q=topic&limit=2")
+        first = resp.get_json()
+        assert len(first["articles"]) == 2
+        resp = client.get(f"/api/articles?q=topic&limit=2&cursor={first['next_cursor']}")
+        second = resp.get_json()
+        assert len(second["articles"]) == 1
+        assert second["next_cursor"] is None
+        ids = {a["id"] for a in first["articles"] + second["articles"]}
+        assert len(ids) == 3
+
+    def test_postgres_search_sql(self, client, db, monkeypatch):
+        # The suite runs on SQLite; compile the Postgres branch instead.
+        captured = []
+
+        def capture(query):
+            captured.append(query.statement)
+            return []
+
+        monkeypatch.setattr(db.engine.dialect, "name", "postgresql")
+        monkeypatch.setattr(Query, "all", capture)
+        cursor = encode_cursor([0.1, 7])
+        resp = client.get(f"/api/articles?q=rust&limit=5&cursor={cursor}")
+        assert resp.status_code == 200
+        sql = " ".join(str(captured[0].compile(dialect=postgresql.dialect())).split())
+        rank = ("CAST(ts_rank(article.search_vector, "
+                "websearch_to_tsquery(%(websearch_to_tsquery_1)s, %(websearch_to_tsquery_2)s)) "
+                "AS FLOAT(53))")
+        assert "article.search_vector @@ websearch_to_tsquery(" in sql
+        assert f"{rank} < %(param_1)s OR {rank} = %(param_2)s AND article.id < %(id_1)s" in sql
+        assert sql.endswith(f"ORDER BY {rank} DESC, article.id DESC LIMIT %(param_3)s")
+        params = captured[0].compile(dialect=postgresql.dialect()).params
+        # The cursor's rank comes back as the same double, not a rounded real.
+        assert params["param_1"] == params["param_2"] == 0.1
+
 
 class TestArticleDetail:
     def test_detail_public(self, client, db):
@@ -29,6 +153,22 @@ class TestArticleDetail:
         assert data["description"] == "Hello"
         assert "comments" in data
 
+    def test_detail_query_count_is_constant(self, client, db):
+        _seed_articles(db, 1)
+        art = Article.query.first()
+        for i in range(10):
+            db.session.add(Comment(description=f"c{i}", article_id=art.id))
+        db.session.commit()
+        art_id = art.id
+        db.session.expunge_all()
+        client.get("/api/categories")  # warm the category registry
+        with count_queries(db) as queries:
+            resp = client.get(f"/api/articles/{art_id}")
+        data = resp.get_json()["article"]
+        assert len(data["comments"]) == 10
+        assert data["tags"] == ["a", "b"]
+        assert len(queries) <= 3
+
     def test_detail_nonexistent(self, client, db):
         resp = client.get("/api/articles/999")
         assert resp.status_code == 404
@@ -53,6 +193,34 @@ class TestArticleAdd:
         assert "a" in art["tags"]
         assert "b" in art["tags"]
 
+    def test_add_normalizes_and_dedupes_tags(self, client, user):
+        login(client)
+        resp = client.post(
+            "/api/articles",
+            json={"title": "T", "tags": " Machine   Learning, machine learning ,AI"},
+        )
+        assert resp.get_json()["article"]["tags"] == ["machine learning", "ai"]
+        assert sorted(t.name for t in Tag.query.all()) == ["ai", "machine learning"]
+
+    def test_add_reuses_existing_tags(self, client, user, db):
+        db.session.add(Tag(name="python"))
+        db.session.commit()
+        login(client)
+        client.post("/api/articles", json={"title": "A", "tags": "Python, new"})
+        client.post("/api/articles", json={"title": "B", "tags": "python, NEW"})
+        assert Tag.query.count() == 2
+
+    def test_add_tag_queries_do_not_grow_with_tag_count(self, client, user, db):
+        login(client)
+        client.post("/api/articles", json={"title": "Warm-up"})
+        counts = []
+        for n in (1, 20):
+            tags = ",".join(f"tag{n}-{i}" for i in range(n))
+            with count_queries(db) as queries:
+                client.post("/api/articles", json={"title": "T", "tags": tags})
+            counts.append(len(queries))
+        assert counts[0] == counts[1]
+
     def test_add_empty_title(self, client, user):
         login(client)
         resp = client.post("/api/articles", json={"title": "", "description": ""})
@@ -127,6 +295,27 @@ class TestArticleDelete:
         assert resp.status_code == 200
         assert Article.query.count() == 0
 
+    def test_delete_cascades_comments_and_tags_set_based(self, client, user, db):
+        art = Article(title="Mine", author="alice", user_id=user.id,
+                      tag_objects=[Tag(name="t1"), Tag(name="t2")])
+        db.session.add(art)
+        db.session.flush()
+        parent = None
+        for i in range(20):
+            parent = Comment(description=f"c{i}", article_id=art.id, parent=parent)
+            db.session.add(parent)
+        db.session.commit()
+        art_id = art.id
+        login(client)
+        db.session.expunge_all()
+        with count_queries(db) as queries:
+            resp = client.delete(f"/api/articles/{art_id}")
+        assert resp.status_code == 200
+        assert Comment.query.count() == 0
+        assert db.session.execute(db.text("SELECT COUNT(*) FROM article_tags")).scalar() == 0
+        assert Tag.query.count() == 2
+        assert len(queries) <= 5
+
     def test_delete_other_user_denied(self, client, user, other_user, db):
         art = Article(title="Bob's", author="bob", user_id=other_user.id)
         db.session.add(art)
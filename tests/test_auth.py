@@ -1,5 +1,10 @@
-from conftest import login, signup
+import re
+
+from flask import g
+
+from conftest import count_queries, login, signup
 from models import User
+from routes.auth import user_cache
 
 
 class TestSignup:
@@ -183,3 +188,55 @@ class TestProfile:
         updated = User.query.get(user.id)
         assert updated.full_name is None
         assert updated.email is None
+
+
+class TestUserCache:
+    def _reads_user_table(self, statements):
+        return any(re.search(r'FROM "?user"?\s', s) for s in statements)
+
+    def _next_request(self, db):
+        # The fixtures share one app context across requests, so drop what
+        # a real request would start without: the loaded user and session.
+        g.pop("_login_user", None)
+        db.session.remove()
+
+    def test_authenticated_requests_skip_user_table(self, client, db, user):
+        login(client)
+        self._next_request(db)
+        client.get("/api/me")
+        self._next_request(db)
+        with count_queries(db) as statements:
+            assert client.get("/api/me").get_json()["user"]["username"] == "alice"
+            assert client.get("/api/todos").status_code == 200
+        assert not self._reads_user_table(statements)
+
+    def test_profile_update_invalidates_entry(self, client, db, user):
+        user_id = user.id
+        login(client)
+        self._next_request(db)
+        client.get("/api/me")
+        self._next_request(db)
+        resp = client.put(
+            "/api/profile",
+            json={"username": "alice2", "full_name": "Alice", "email": ""},
+        )
+        assert resp.status_code == 200
+        assert user_cache.get(user_id) is None
+        self._next_request(db)
+        data = client.get("/api/me").get_json()["user"]
+        assert data["username"] == "alice2"
+        assert data["full_name"] == "Alice"
+        assert db.session.get(User, user_id).username == "alice2"
+
+    def test_entries_expire(self, client, db, user, monkeypatch):
+        user_id = user.id
+        login(client)
+        self._next_request(db)
+        client.get("/api/me")
+        assert user_cache.get(user_id) is not None
+        now = user_cache._clock()
+        monkeypatch.setattr(user_cache, "_clock", lambda: now + 61)
+        self._next_request(db)
+        with count_queries(db) as statements:
+            client.get("/api/me")
+        assert self._reads_user_table(statements)
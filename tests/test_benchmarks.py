@@ -0,0 +1,75 @@
+from benchmarks import datagen
+from benchmarks.run import compare, run
+from models import Article, Comment, ShortUrl, User
+
+
+def _results(**scenarios):
+    return {"results": {
+        name: {"p50_ms": p50, "p95_ms": p95, "queries_per_request": queries}
+        for name, (p50, p95, queries) in scenarios.items()
+    }}
+
+
+class TestDatagen:
+    def test_generates_requested_counts(self, app, db):
+        counts = datagen.generate("tiny", seed=1)
+        scale = datagen.SCALES["tiny"]
+        assert counts["users"] == User.query.count() == scale["users"]
+        assert counts["articles"] == Article.query.count() == scale["articles"]
+        assert Comment.query.count() == scale["articles"] * scale["comments_per_article"]
+        assert ShortUrl.query.count() == scale["users"] * scale["short_urls_per_user"]
+
+    def test_is_repeatable(self, app, db):
+        datagen.generate("tiny", seed=7)
+        first = [a.title for a in Article.query.order_by(Article.id)]
+        db.drop_all()
+        db.create_all()
+        datagen.generate("tiny", seed=7)
+        assert [a.title for a in Article.query.order_by(Article.id)] == first
+
+    def test_threads_respect_depth(self, app, db):
+        datagen.generate("tiny")
+        parents = dict(db.session.query(Comment.id, Comment.parent_id))
+        deepest = 0
+        for comment_id in parents:
+            depth = 1
+            while parents[comment_id]:
+                comment_id = parents[comment_id]
+                depth += 1
+            deepest = max(deepest, depth)
+        assert 1 < deepest <= datagen.SCALES["tiny"]["comment_depth"]
+
+
+class TestRun:
+    def test_measures_scenarios(self, app, db):
+        datagen.generate("tiny")
+        results = run(app, iterations=2, warmup=1,
+                      only=["articles.list", "comments.tree", "todos.index"])
+        hit = results.pop("articles.list_cache_hit")
+        assert set(results) == {
+            "articles.list", "articles.list_page_2", "articles.list_by_tag",
+            "articles.list_by_category", "comments.tree", "todos.index",
+        }
+        for result in results.values():
+            assert result["iterations"] == 2
+            assert result["p50_ms"] > 0
+            assert result["queries_per_request"] >= 1
+        assert hit["queries_per_request"] == 0
+
+
+class TestCompare:
+    def test_flags_latency_regression(self):
+        baseline = _results(a=(10, 20, 2), b=(10, 20, 2))
+        current = _results(a=(13, 20, 2), b=(10.5, 21, 2))
+        regressions = compare(current, baseline, threshold=0.25)
+        assert len(regressions) == 1
+        assert regressions[0].startswith("a: p50_ms")
+
+    def test_ignores_tiny_absolute_changes(self):
+        baseline = _results(a=(0.1, 0.2, 1))
+        current = _results(a=(0.2, 0.4, 1))
+        assert compare(current, baseline, threshold=0.25, min_delta_ms=0.5) == []
+
+    def test_flags_extra_queries(self):
+        regressions = compare(_results(a=(1, 1, 3)), _results(a=(1, 1, 2)))
+        assert regressions == ["a: queries/request 2 -> 3"]
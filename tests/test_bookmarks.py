@@ -1,5 +1,8 @@
+from datetime import datetime
+
 from conftest import login
 from models import Bookmark
+from pagination import encode_cursor
 
 
 class TestBookmarkIndex:
@@ -26,6 +29,29 @@ class TestBookmarkIndex:
         assert resp.status_code == 200
         assert resp.get_json()["bookmarks"] == []
 
+    def test_index_paginates_newest_first(self, client, user, db):
+        same = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(3):
+            db.session.add(Bookmark(url="https://a.com", title=f"Tie {i}",
+                                    user_id=user.id, created_at=same))
+        db.session.add(Bookmark(url="https://b.com", title="Newest", user_id=user.id,
+                                created_at=datetime(2026, 2, 1)))
+        db.session.commit()
+        login(client)
+        resp = client.get("/api/bookmarks?limit=2")
+        first = resp.get_json()
+        assert [b["title"] for b in first["bookmarks"]] == ["Newest", "Tie 2"]
+        resp = client.get(f"/api/bookmarks?limit=2&cursor={first['next_cursor']}")
+        second = resp.get_json()
+        assert [b["title"] for b in second["bookmarks"]] == ["Tie 1", "Tie 0"]
+        assert second["next_cursor"] is None
+
+    def test_index_cursor_with_wrong_types(self, client, user):
+        login(client)
+        for values in (["2026-01-01T00:00:00", "1"], [5, 1], ["not-a-date", 1], [None, 1]):
+            resp = client.get(f"/api/bookmarks?cursor={encode_cursor(values)}")
+            assert resp.status_code == 400, values
+
 
 class TestBookmarkAdd:
     def test_add_requires_login(self, client, db):
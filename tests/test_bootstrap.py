@@ -0,0 +1,73 @@
+import json
+import re
+
+import pytest
+
+from app import FRONTEND_DIST
+from bootstrap import page_cache
+from conftest import login
+from models import Category
+from static_assets import assets
+
+INDEX = (b'<!doctype html><html><head><title>App</title></head>'
+         b'<body><div id="root"></div></body></html>')
+
+
+@pytest.fixture()
+def dist(tmp_path, app):
+    (tmp_path / "index.html").write_bytes(INDEX)
+    assets.load(str(tmp_path))
+    yield tmp_path
+    assets.load(FRONTEND_DIST)
+
+
+@pytest.fixture()
+def categories(db):
+    db.session.add_all([Category(name="Science"), Category(name="Art")])
+    db.session.commit()
+
+
+def _bootstrap(resp):
+    html = resp.get_data(as_text=True)
+    match = re.search(r'<script id="bootstrap" type="application/json">(.*?)</script>', html)
+    assert match, html
+    assert html.index(match.group(0)) < html.index("</head>")
+    return json.loads(match.group(1))
+
+
+class TestBootstrap:
+    def test_anonymous_payload(self, dist, client, categories):
+        resp = client.get("/articles")
+        assert resp.status_code == 200
+        data = _bootstrap(resp)
+        assert data["user"] is None
+        assert [c["name"] for c in data["categories"]] == ["Art", "Science"]
+        assert "Cookie" in resp.headers["Vary"]
+
+    def test_authenticated_payload(self, dist, client, user, categories):
+        login(client)
+        resp = client.get("/")
+        data = _bootstrap(resp)
+        assert data["user"] == {
+            "id": user.id, "username": "alice", "full_name": None, "email": None,
+        }
+        assert len(data["categories"]) == 2
+        assert resp.headers["Cache-Control"] == "private, no-cache"
+        again = client.get("/", headers={"If-None-Match": resp.headers["ETag"]})
+        assert again.status_code == 304
+
+    def test_template_cached_per_category_version(self, dist, client, db, categories):
+        client.get("/")
+        assert len(page_cache) == 2
+        client.get("/todos")
+        assert page_cache.hits >= 1
+        db.session.add(Category(name="History"))
+        db.session.commit()
+        assert len(_bootstrap(client.get("/"))["categories"]) == 3
+
+    def test_payload_cannot_close_script(self, dist, client, db):
+        db.session.add(Category(name="</script><script>alert(1)</script>"))
+        db.session.commit()
+        resp = client.get("/")
+        assert resp.get_data(as_text=True).count("</script>") == 1
+        assert _bootstrap(resp)["categories"][0]["name"].startswith("</script>")
@@ -0,0 +1,67 @@
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kwargs):
+    kwargs.setdefault("jitter", 0)
+    return CircuitBreaker(failure_threshold=3, reset_timeout=10, max_timeout=40,
+                          clock=clock, **kwargs)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = _breaker(FakeClock())
+        for _ in range(2):
+            breaker.record_failure()
+            assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_success_resets_failure_count(self):
+        breaker = _breaker(FakeClock())
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        assert breaker.failures == 1
+
+    def test_half_open_allows_one_trial(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_failed_trial_doubles_timeout_up_to_max(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.retry_at == 10
+        for expected in (20, 40, 40):
+            clock.now = breaker.retry_at
+            assert breaker.allow()
+            breaker.record_failure()
+            assert breaker.retry_at == clock.now + expected
+
+    def test_jitter_spreads_retries(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, jitter=0.5)
+        for _ in range(3):
+            breaker.record_failure()
+        assert 10 <= breaker.retry_at <= 15
@@ -0,0 +1,177 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from cache import (
+    MISSING,
+    LRUCache,
+    MemoryCache,
+    RedisCache,
+    SQLiteCache,
+    _read_reply,
+    cache_from_url,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    def test_get_and_set(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b", MISSING) is MISSING
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = LRUCache(10, ttl=60, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+        clock.now = 10
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        clock.now = 61
+        assert cache.get("a") is None
+
+    def test_cached_none_is_distinct_from_missing(self):
+        cache = LRUCache(10)
+        cache.set("a", None)
+        assert cache.get("a", MISSING) is None
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(10)
+        cache.set("a", 1)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.set("b", 2)
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestMemoryCache:
+    def test_add_only_when_absent_or_expired(self):
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+        assert cache.add("lease", 1, ttl=10)
+        assert not cache.add("lease", 2, ttl=10)
+        clock.now = 11
+        assert cache.add("lease", 3, ttl=10)
+        cache.delete("lease")
+        assert cache.get("lease") is None
+
+
+class TestSQLiteCache:
+    def test_entries_are_shared_between_instances(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        SQLiteCache(path).set("k", {"posts": [1, 2]}, ttl=60)
+        assert SQLiteCache(path).get("k") == {"posts": [1, 2]}
+
+    def test_expiry_and_add(self, tmp_path):
+        clock = FakeClock()
+        cache = SQLiteCache(str(tmp_path / "cache.db"), clock=clock)
+        cache.set("k", 1, ttl=5)
+        assert cache.add("lease", True, ttl=5)
+        assert not cache.add("lease", True, ttl=5)
+        clock.now = 6
+        assert cache.get("k") is None
+        assert cache.add("lease", True, ttl=5)
+        cache.delete("lease")
+        assert cache.get("lease") is None
+
+
+class _RespStandIn(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for RedisCache."""
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                args = _read_reply(self.rfile)
+            except Exception:
+                return
+            command = args[0].upper()
+            if command in ("AUTH", "SELECT"):
+                self.wfile.write(b"+OK\r\n")
+            elif command == "GET":
+                value, expires = store.get(args[1], (None, 0))
+                if value is None or expires < time.time():
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    data = value.encode()
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(data), data))
+            elif command == "SET":
+                options = [a.upper() for a in args[3:]]
+                ttl = int(args[3 + options.index("PX") + 1]) / 1000
+                current = store.get(args[1])
+                if "NX" in options and current and current[1] > time.time():
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    store[args[1]] = (args[2], time.time() + ttl)
+                    self.wfile.write(b"+OK\r\n")
+            elif command == "DEL":
+                self.wfile.write(b":%d\r\n" % int(store.pop(args[1], None) is not None))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture()
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespStandIn)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestRedisCache:
+    def test_round_trip(self, resp_server):
+        host, port = resp_server.server_address
+        cache = cache_from_url(f"redis://:secret@{host}:{port}/2")
+        cache.set("k", {"a": 1}, ttl=60)
+        assert cache.get("k") == {"a": 1}
+        assert "vibe:k" in resp_server.store
+        assert cache.add("lease", True, ttl=60)
+        assert not cache.add("lease", True, ttl=60)
+        cache.delete("k")
+        assert cache.get("k") is None
+
+    def test_unreachable_server_is_a_miss(self):
+        cache = RedisCache(host="127.0.0.1", port=1, timeout=0.2)
+        assert cache.get("k") is None
+        cache.set("k", 1, ttl=60)
+        assert not cache.add("k", 1, ttl=60)
+
+
+class TestCacheFromUrl:
+    def test_schemes(self, tmp_path):
+        assert isinstance(cache_from_url("memory://"), MemoryCache)
+        sqlite_cache = cache_from_url(f"sqlite:///{tmp_path}/c.db")
+        assert isinstance(sqlite_cache, SQLiteCache)
+        assert sqlite_cache.path == f"{tmp_path}/c.db"
+        redis_cache = cache_from_url("redis://cache.internal:6380/3")
+        assert (redis_cache.host, redis_cache.port, redis_cache.db) == ("cache.internal", 6380, 3)
+        with pytest.raises(ValueError):
+            cache_from_url("ftp://nope")
@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import insert, text
+
+from cache import cache_from_url
+from conftest import count_queries, login
+from models import Article, Category
+from routes.categories import CategoryRegistry, registry
+from versions import versions
+
+
+@pytest.fixture()
+def categories(db):
+    science, art = Category(name="Science"), Category(name="Art")
+    db.session.add_all([science, art])
+    db.session.commit()
+    return science, art
+
+
+class TestListCategories:
+    def test_lists_by_name_with_etag(self, client, categories):
+        resp = client.get("/api/categories")
+        assert resp.status_code == 200
+        assert [c["name"] for c in resp.get_json()["categories"]] == ["Art", "Science"]
+        assert resp.headers["ETag"]
+        assert resp.headers["Cache-Control"] == "no-cache"
+
+    def test_not_modified(self, client, db, categories):
+        etag = client.get("/api/categories").headers["ETag"]
+        with count_queries(db) as queries:
+            resp = client.get("/api/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.data == b""
+        assert resp.headers["ETag"] == etag
+        assert queries == []
+
+    def test_etag_changes_with_categories(self, client, db, categories):
+        etag = client.get("/api/categories").headers["ETag"]
+        categories[1].name = "Arts"
+        db.session.commit()
+        resp = client.get("/api/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        assert "Arts" in [c["name"] for c in resp.get_json()["categories"]]
+
+
+class TestRegistry:
+    def test_served_from_memory(self, client, db, categories):
+        science_id, art_id = categories[0].id, categories[1].id
+        client.get("/api/categories")
+        loads = registry.loads
+        with count_queries(db) as queries:
+            client.get("/api/categories")
+            assert registry.get(science_id)["name"] == "Science"
+            assert registry.name(art_id) == "Art"
+        assert queries == []
+        assert registry.loads == loads
+
+    def test_commit_invalidates(self, db, categories):
+        registry.listing()
+        db.session.delete(categories[1])
+        db.session.commit()
+        assert [c["name"] for c in registry.listing()[0]] == ["Science"]
+
+    def test_unrelated_commit_keeps_snapshot(self, db, categories):
+        registry.listing()
+        loads = registry.loads
+        db.session.add(Article(title="t", author="a"))
+        db.session.commit()
+        registry.listing()
+        assert registry.loads == loads
+
+    def test_reloads_on_another_workers_commit(self, app, db, categories, tmp_path):
+        url = f"sqlite:///{tmp_path}/versions.db"
+        app.config["VERSION_CACHE_URL"] = url
+        try:
+            versions.clear()
+            assert registry.name(categories[1].id) == "Art"
+            # Another worker renames it: its commit only reaches us through
+            # the shared stamp file.
+            db.session.execute(text("UPDATE category SET name = 'Arts' WHERE name = 'Art'"))
+            db.session.commit()
+            assert registry.name(categories[1].id) == "Art"
+            cache_from_url(url).set("version:category", "other-worker", 60)
+            assert registry.name(categories[1].id) == "Arts"
+        finally:
+            app.config["VERSION_CACHE_URL"] = "memory://"
+            versions.clear()
+
+    def test_miss_rechecks_database(self, db, categories):
+        local = CategoryRegistry()
+        local.listing()
+        # As if another worker added it; Core inserts skip the ORM events.
+        db.session.execute(insert(Category), [{"id": 99, "name": "History"}])
+        db.session.commit()
+        assert local.get(99)["name"] == "History"
+        assert local.get("99")["name"] == "History"
+        assert local.get(100) is None
+        assert local.get("nope") is None
+
+
+class TestArticleCategories:
+    def test_validates_from_registry(self, client, user, categories):
+        login(client)
+        resp = client.post("/api/articles",
+                           json={"title": "T", "category_id": str(categories[0].id)})
+        assert resp.status_code == 201
+        assert resp.get_json()["article"]["category_id"] == categories[0].id
+        assert resp.get_json()["article"]["category"] == "Science"
+        resp = client.post("/api/articles", json={"title": "T", "category_id": 999})
+        assert resp.status_code == 400
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from clicks import agent_family, click_counter, compact_rollups, referrer_host
+from models import ClickRollup, ShortUrl
+
+
+class TestClassifiers:
+    def test_agent_family(self):
+        assert agent_family("") == "unknown"
+        assert agent_family("Mozilla/5.0 Chrome/120.0 Safari/537.36") == "chrome"
+        assert agent_family("Mozilla/5.0 Chrome/120.0 Safari/537.36 Edg/120.0") == "edge"
+        assert agent_family("Mozilla/5.0 Version/17.0 Safari/605.1.15") == "safari"
+        assert agent_family("Googlebot/2.1 (+http://www.google.com/bot.html)") == "bot"
+        assert agent_family("something-else") == "other"
+
+    def test_referrer_host(self):
+        assert referrer_host(None) == ""
+        assert referrer_host("https://Example.COM/path?q=1") == "example.com"
+        assert referrer_host("http://[bad/") == ""
+
+
+class TestClickFlush:
+    def test_flush_skips_deleted_urls(self, client, user, db):
+        su = ShortUrl(short_code="gone01", original_url="https://a.com", user_id=user.id)
+        db.session.add(su)
+        db.session.commit()
+        client.get("/s/gone01")
+        db.session.delete(su)
+        db.session.commit()
+        assert click_counter.flush() == 1
+        assert ClickRollup.query.count() == 0
+        assert click_counter.pending(su.id) == 0
+
+
+class TestCompactRollups:
+    def test_folds_old_hours_into_days(self, user, db):
+        su = ShortUrl(short_code="old001", original_url="https://a.com", user_id=user.id)
+        db.session.add(su)
+        db.session.flush()
+        for hour, clicks in ((1, 2), (5, 3)):
+            db.session.add(ClickRollup(short_url_id=su.id, granularity="hour",
+                                       bucket=datetime(2026, 1, 1, hour), referrer="",
+                                       agent="chrome", clicks=clicks))
+        db.session.add(ClickRollup(short_url_id=su.id, granularity="hour",
+                                   bucket=datetime(2026, 1, 20, 3), referrer="",
+                                   agent="chrome", clicks=7))
+        db.session.commit()
+        assert compact_rollups(now=datetime(2026, 1, 21)) == 2
+        rows = {(r.granularity, r.bucket): r.clicks for r in ClickRollup.query.all()}
+        assert rows == {
+            ("day", datetime(2026, 1, 1)): 5,
+            ("hour", datetime(2026, 1, 20, 3)): 7,
+        }
+        assert compact_rollups(now=datetime(2026, 1, 21)) == 0
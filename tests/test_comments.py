@@ -1,5 +1,6 @@
-from conftest import login
+from conftest import count_queries, login
 from models import Article, Comment
+from routes.comments import _load_tree
 
 
 def _create_article(db, user=None):
@@ -127,6 +128,25 @@ class TestCommentDelete:
         assert resp.status_code == 200
         assert Comment.query.count() == 0
 
+    def test_delete_deep_thread_is_set_based(self, client, user, db):
+        art = _create_article(db, user)
+        parent = root = Comment(author="alice", description="Root", article_id=art.id,
+                                user_id=user.id)
+        db.session.add(root)
+        for i in range(30):
+            child = Comment(author="x", description=f"R{i}", article_id=art.id, parent=parent)
+            db.session.add(child)
+            parent = child
+        db.session.commit()
+        art_id, root_id = art.id, root.id
+        login(client)
+        db.session.expunge_all()
+        with count_queries(db) as queries:
+            resp = client.delete(f"/api/articles/{art_id}/comments/{root_id}")
+        assert resp.status_code == 200
+        assert Comment.query.count() == 0
+        assert len(queries) <= 5
+
 
 class TestCommentReplies:
     def test_reply_creates_child_with_parent_id(self, client, user, db):
@@ -198,3 +218,140 @@ class TestCommentReplies:
         by_id = {c["id"]: c for c in comments}
         assert by_id[parent.id]["parent_id"] is None
         assert by_id[reply.id]["parent_id"] == parent.id
+
+
+class TestCommentTree:
+    def _thread(self, db, art, parent=None, count=1):
+        comments = [
+            Comment(author="a", description="c", article_id=art.id,
+                    parent_id=parent.id if parent else None)
+            for _ in range(count)
+        ]
+        db.session.add_all(comments)
+        db.session.commit()
+        return comments
+
+    def test_flat_listing(self, client, db):
+        art = _create_article(db)
+        root, = self._thread(db, art)
+        self._thread(db, art, root, 2)
+        resp = client.get(f"/api/articles/{art.id}/comments")
+        assert resp.status_code == 200
+        assert len(resp.get_json()["comments"]) == 3
+
+    def test_tree_nests_replies(self, client, db):
+        art = _create_article(db)
+        root, = self._thread(db, art)
+        child, = self._thread(db, art, root)
+        grandchild, = self._thread(db, art, child)
+        resp = client.get(f"/api/articles/{art.id}/comments?tree=1")
+        assert resp.status_code == 200
+        tree = resp.get_json()["comments"]
+        assert [c["id"] for c in tree] == [root.id]
+        assert tree[0]["replies"][0]["id"] == child.id
+        assert tree[0]["replies"][0]["replies"][0]["id"] == grandchild.id
+        assert tree[0]["replies"][0]["replies"][0]["replies"] == []
+
+    def test_tree_is_one_query(self, client, db):
+        art = _create_article(db)
+        roots = self._thread(db, art, count=3)
+        for root in roots:
+            for child in self._thread(db, art, root, 3):
+                self._thread(db, art, child, 2)
+        art_id = art.id
+        db.session.expunge_all()
+        with count_queries(db) as queries:
+            resp = client.get(f"/api/articles/{art_id}/comments?tree=1")
+        assert len(resp.get_json()["comments"]) == 3
+        # One for the article existence check, one for the thread.
+        assert len(queries) == 2
+
+    def test_tree_depth_limit_marks_truncated_nodes(self, client, db):
+        art = _create_article(db)
+        root, = self._thread(db, art)
+        child, = self._thread(db, art, root)
+        self._thread(db, art, child)
+        resp = client.get(f"/api/articles/{art.id}/comments?tree=1&depth=2")
+        child_node = resp.get_json()["comments"][0]["replies"][0]
+        assert child_node["replies"] == []
+        assert child_node["next_cursor"] is not None
+        resp = client.get(
+            f"/api/articles/{art.id}/comments?tree=1&parent_id={child.id}"
+            f"&cursor={child_node['next_cursor']}"
+        )
+        assert len(resp.get_json()["comments"]) == 1
+
+    def test_tree_paginates_each_level(self, client, db):
+        art = _create_article(db)
+        self._thread(db, art, count=3)
+        root = Comment.query.order_by(Comment.id).first()
+        self._thread(db, art, root, 3)
+        resp = client.get(f"/api/articles/{art.id}/comments?tree=1&limit=2")
+        data = resp.get_json()
+        assert len(data["comments"]) == 2
+        assert data["next_cursor"] is not None
+        first = data["comments"][0]
+        assert len(first["replies"]) == 2
+        assert first["next_cursor"] is not None
+        resp = client.get(
+            f"/api/articles/{art.id}/comments?tree=1&limit=2"
+            f"&parent_id={root.id}&cursor={first['next_cursor']}"
+        )
+        more = resp.get_json()
+        assert len(more["comments"]) == 1
+        assert more["next_cursor"] is None
+        resp = client.get(
+            f"/api/articles/{art.id}/comments?tree=1&limit=2&cursor={data['next_cursor']}"
+        )
+        assert len(resp.get_json()["comments"]) == 1
+
+    def test_tree_reads_only_the_page(self, app, db):
+        art = _create_article(db)
+        root, = self._thread(db, art)
+        replies = self._thread(db, art, root, 300)
+        db.session.add_all(
+            Comment(author="a", description="c", article_id=art.id, parent_id=r.id)
+            for r in replies
+        )
+        db.session.commit()
+        rows = _load_tree(art.id, None, 0, depth=3, limit=2)
+        # The root, three replies (the third only flags more) and the
+        # grandchildren of the two shown; pruned replies are never walked.
+        assert len(rows) == 6
+
+    def test_tree_work_ignores_sibling_count(self, app, db):
+        art = _create_article(db)
+        root, = self._thread(db, art)
+        reply = {"author": "a", "description": "c", "article_id": art.id, "parent_id": root.id}
+        raw = db.session.connection().connection.driver_connection
+        steps = []
+
+        def sqlite_steps():
+            count = [0]
+
+            def tick():
+                count[0] += 1
+                return 0
+
+            raw.set_progress_handler(tick, 100)
+            try:
+                _load_tree(art.id, None, 0, depth=3, limit=2)
+            finally:
+                raw.set_progress_handler(None, 0)
+            return count[0]
+
+        for added in (100, 4900):
+            db.session.execute(Comment.__table__.insert(), [reply] * added)
+            db.session.commit()
+            steps.append(sqlite_steps())
+        # Reading every sibling would make 50x the replies cost ~50x more.
+        assert steps[1] <= 2 * steps[0]
+
+    def test_tree_invalid_depth(self, client, db):
+        art = _create_article(db)
+        resp = client.get(f"/api/articles/{art.id}/comments?tree=1&depth=0")
+        assert resp.status_code == 400
+
+    def test_tree_nonexistent_article(self, client, db):
+        resp = client.get("/api/articles/999/comments?tree=1")
+        assert resp.status_code == 404
@@ -1,9 +1,23 @@
+import gzip
+import hashlib
 import json
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cache import MemoryCache, SQLiteCache
+from conftest import login
+from httpclient import HTTPClient
+from models import FeedSubscription, User
+from routes import feeds
+from routes.feeds import SUBREDDITS
 
 
 def _reddit_response(subreddit, posts):
-    """Build a mock Reddit JSON response."""
+    """Build a Reddit JSON listing."""
     children = []
     for p in posts:
         children.append(
@@ -26,32 +40,88 @@ def _reddit_response(subreddit, posts):
     return json.dumps({"data": {"children": children}}).encode()
 
 
-def _mock_urlopen(subreddit_posts):
-    """Return a side_effect function for urlopen that returns appropriate data per subreddit."""
+class _RedditHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        upstream = self.server
+        with upstream.lock:
+            upstream.requests.append((self.path, dict(self.headers)))
+        subreddit = self.path.split("/")[2]
+        time.sleep(upstream.delays.get(subreddit, 0))
+        if subreddit in upstream.failures or subreddit not in upstream.posts:
+            self._reply(500, b"")
+            return
+        body = _reddit_response(subreddit, upstream.posts[subreddit])
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304, b"", {"ETag": etag})
+            return
+        headers = {"ETag": etag, "Content-Type": "application/json"}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        self._reply(200, body, headers)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def upstream(monkeypatch):
+    """A local stand-in for reddit.com that the feeds client talks to."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RedditHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.posts = {}
+    server.delays = {}
+    server.failures = set()
+    server.requests = []
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    client = HTTPClient(f"http://{host}:{port}", max_connections=feeds.FETCH_WORKERS)
+    monkeypatch.setattr(feeds, "_http", client)
+    yield server
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def feed_cache(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(feeds, "_cache", cache)
+    monkeypatch.setattr(feeds, "_sources", {})
+    feeds.prefetcher.clear()
+    return cache
 
-    def side_effect(req, **kwargs):
-        url = req.full_url if hasattr(req, "full_url") else str(req)
-        for sub, posts in subreddit_posts.items():
-            if f"/r/{sub}/" in url:
-                resp = MagicMock()
-                resp.read.return_value = _reddit_response(sub, posts)
-                resp.__enter__ = lambda s: s
-                resp.__exit__ = MagicMock(return_value=False)
-                return resp
-        raise Exception(f"Unexpected URL: {url}")
 
-    return side_effect
+def _one_post_each(upstream):
+    upstream.posts.update({sub: [{"title": sub}] for sub in SUBREDDITS})
 
 
 class TestListFeeds:
-    @patch("routes.feeds._cache", {})
-    @patch("routes.feeds.urllib.request.urlopen")
-    def test_returns_posts(self, mock_urlopen, client):
-        mock_urlopen.side_effect = _mock_urlopen(
+    def test_returns_posts(self, upstream, client):
+        upstream.posts.update(
             {
                 "leadership": [{"title": "Lead well", "score": 50}],
                 "management": [{"title": "Manage teams", "score": 30}],
-                "MachineLearning": [{"title": "New ML paper", "score": 100}],
+                "machinelearning": [{"title": "New ML paper", "score": 100}],
                 "artificial": [{"title": "AI news", "score": 20}],
             }
         )
@@ -66,46 +136,385 @@ class TestListFeeds:
         assert data["posts"][0]["score"] == 100
         assert data["posts"][-1]["title"] == "AI news"
 
-    @patch("routes.feeds._cache", {})
-    @patch("routes.feeds.urllib.request.urlopen")
-    def test_handles_reddit_failure(self, mock_urlopen, client):
-        mock_urlopen.side_effect = Exception("Connection refused")
+    def test_handles_reddit_failure(self, upstream, client):
+        upstream.failures.update(SUBREDDITS)
 
         resp = client.get("/api/feeds")
         assert resp.status_code == 502
         assert resp.get_json()["error"] == "Failed to fetch feeds."
 
-    @patch("routes.feeds._cache", {})
-    @patch("routes.feeds.urllib.request.urlopen")
-    def test_respects_sort_param(self, mock_urlopen, client):
-        mock_urlopen.side_effect = _mock_urlopen(
-            {
-                "leadership": [{"title": "Post 1", "score": 10}],
-                "management": [{"title": "Post 2", "score": 20}],
-                "MachineLearning": [{"title": "Post 3", "score": 30}],
-                "artificial": [{"title": "Post 4", "score": 40}],
-            }
-        )
+    def test_respects_sort_param(self, upstream, client):
+        _one_post_each(upstream)
 
         resp = client.get("/api/feeds?sort=new")
         assert resp.status_code == 200
-        # Verify the URL contained /new.json
-        calls = mock_urlopen.call_args_list
-        for call in calls:
-            req = call[0][0]
-            assert "/new.json" in req.full_url
-
-    @patch("routes.feeds._cache", {})
-    @patch("routes.feeds.urllib.request.urlopen")
-    def test_returns_max_50_posts(self, mock_urlopen, client):
+        assert len(upstream.requests) == len(SUBREDDITS)
+        for path, _ in upstream.requests:
+            assert "/new.json" in path
+
+    def test_returns_max_50_posts(self, upstream, client):
         # Each subreddit returns 15 posts = 60 total, should be capped to 50
-        mock_urlopen.side_effect = _mock_urlopen(
-            {
-                sub: [{"title": f"Post {i}", "score": i} for i in range(15)]
-                for sub in ["leadership", "management", "MachineLearning", "artificial"]
-            }
+        upstream.posts.update(
+            {sub: [{"title": f"Post {i}", "score": i} for i in range(15)] for sub in SUBREDDITS}
         )
 
         resp = client.get("/api/feeds")
         assert resp.status_code == 200
         assert len(resp.get_json()["posts"]) == 50
+
+
+class TestConcurrentFetch:
+    def test_fetches_run_concurrently(self, upstream, client):
+        _one_post_each(upstream)
+        upstream.delays.update({sub: 0.3 for sub in SUBREDDITS})
+        start = time.monotonic()
+        resp = client.get("/api/feeds")
+        assert resp.status_code == 200
+        assert len(resp.get_json()["posts"]) == 4
+        assert time.monotonic() - start < 0.3 * len(SUBREDDITS)
+
+    def test_returns_partial_results_at_deadline(self, upstream, client, monkeypatch):
+        monkeypatch.setattr(feeds, "FETCH_DEADLINE", 0.3)
+        _one_post_each(upstream)
+        upstream.delays["artificial"] = 1
+        start = time.monotonic()
+        resp = client.get("/api/feeds")
+        assert time.monotonic() - start < 1
+        titles = {p["title"] for p in resp.get_json()["posts"]}
+        assert titles == {"leadership", "management", "machinelearning"}
+        # The straggler keeps going and is cached for the next request.
+        feeds._inflight[("artificial", "hot")].result(timeout=5)
+        titles = {p["title"] for p in client.get("/api/feeds").get_json()["posts"]}
+        assert titles == set(SUBREDDITS)
+
+
+def _cache_all(feed_cache, posts, expires):
+    for sub in SUBREDDITS:
+        feed_cache.set(
+            f"feeds:hot:{sub}", {"expires": expires, "posts": posts}, 3600
+        )
+
+
+class TestStaleWhileRevalidate:
+    def test_serves_stale_and_refreshes_in_background(self, upstream, client, feed_cache):
+        stale = [{"title": "Old", "score": 1}]
+        _cache_all(feed_cache, stale, time.time() - 1)
+        upstream.posts.update({sub: [{"title": "New"}] for sub in SUBREDDITS})
+        upstream.delays.update({sub: 0.2 for sub in SUBREDDITS})
+        start = time.monotonic()
+        resp = client.get("/api/feeds")
+        assert time.monotonic() - start < 0.2
+        assert resp.get_json()["posts"] == stale * len(SUBREDDITS)
+        for future in list(feeds._inflight.values()):
+            future.result(timeout=5)
+        cached = feed_cache.get("feeds:hot:leadership")
+        assert cached["posts"][0]["title"] == "New"
+        assert cached["expires"] > time.time()
+
+    def test_concurrent_misses_share_one_fetch(self, upstream, client):
+        _one_post_each(upstream)
+        upstream.delays.update({sub: 0.2 for sub in SUBREDDITS})
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda _: feeds._get_posts(SUBREDDITS, "hot"), range(6)))
+        assert all(len(posts) == 4 for posts in results)
+        assert len(upstream.requests) == len(SUBREDDITS)
+
+    def test_serves_stale_when_upstream_fails(self, upstream, client, feed_cache):
+        stale = [{"title": "Old", "score": 1}]
+        _cache_all(feed_cache, stale, time.time() - feeds.STALE_TTL - 1)
+        upstream.failures.update(SUBREDDITS)
+        resp = client.get("/api/feeds")
+        assert resp.status_code == 200
+        assert resp.get_json()["posts"] == stale * len(SUBREDDITS)
+
+
+class TestSharedCache:
+    def test_workers_share_entries_through_file_backend(self, upstream, client,
+                                                        monkeypatch, tmp_path):
+        _one_post_each(upstream)
+        path = str(tmp_path / "feeds.db")
+        monkeypatch.setattr(feeds, "_cache", SQLiteCache(path))
+        assert client.get("/api/feeds").status_code == 200
+        # A second worker process opens the same file and sees fresh entries.
+        monkeypatch.setattr(feeds, "_cache", SQLiteCache(path))
+        assert client.get("/api/feeds").status_code == 200
+        assert len(upstream.requests) == len(SUBREDDITS)
+
+    def test_only_lease_holder_revalidates(self, upstream, client, feed_cache):
+        stale = [{"title": "Old", "score": 1}]
+        _cache_all(feed_cache, stale, time.time() - 1)
+        for sub in SUBREDDITS:
+            feed_cache.add(f"feeds:hot:{sub}:refresh", True, 60)
+        resp = client.get("/api/feeds")
+        assert resp.get_json()["posts"] == stale * len(SUBREDDITS)
+        assert feeds._inflight == {}
+        assert upstream.requests == []
+
+
+class TestPrefetcher:
+    def test_refreshes_entries_about_to_expire(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        upstream.requests.clear()
+        assert feeds.prefetcher.run_once() == 0
+        entry = feed_cache.get("feeds:hot:leadership")
+        entry["expires"] = time.time() + feeds.PREFETCH_LEAD - 1
+        feed_cache.set("feeds:hot:leadership", entry, 3600)
+        assert feeds.prefetcher.run_once() == 1
+        feeds._inflight[("leadership", "hot")].result(timeout=5)
+        assert [p for p, _ in upstream.requests] == ["/r/leadership/hot.json?limit=15"]
+        assert feed_cache.get("feeds:hot:leadership")["expires"] > time.time() + 60
+
+    def test_jitter_spreads_refreshes(self, upstream, client, feed_cache, monkeypatch):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        for sub in SUBREDDITS:
+            entry = feed_cache.get(f"feeds:hot:{sub}")
+            entry["expires"] = time.time() + feeds.PREFETCH_LEAD + 1
+            feed_cache.set(f"feeds:hot:{sub}", entry, 3600)
+        # Just outside the lead: only pairs with a large enough jitter are due.
+        monkeypatch.setattr(feeds.random, "uniform", lambda a, b: a)
+        assert feeds.prefetcher.run_once() == 0
+        feeds.prefetcher.clear()
+        client.get("/api/feeds")
+        monkeypatch.setattr(feeds.random, "uniform", lambda a, b: b)
+        assert feeds.prefetcher.run_once() == len(SUBREDDITS)
+
+    def test_drops_idle_pairs(self, upstream, client, feed_cache, monkeypatch):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        for sub in SUBREDDITS:
+            feed_cache.delete(f"feeds:hot:{sub}")
+        clock = time.time() + feeds.PREFETCH_IDLE_TTL + 1
+        monkeypatch.setattr(feeds.prefetcher, "_clock", lambda: clock)
+        assert feeds.prefetcher.run_once() == 0
+        assert feeds.prefetcher.as_dict()["tracked"] == 0
+
+    def test_respects_refresh_lease(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        for sub in SUBREDDITS:
+            feed_cache.delete(f"feeds:hot:{sub}")
+            feed_cache.add(f"feeds:hot:{sub}:refresh", True, 60)
+        assert feeds.prefetcher.run_once() == 0
+
+
+class TestSourceBreaker:
+    def _fail(self, client, times):
+        for _ in range(times):
+            client.get("/api/feeds")
+            for future in list(feeds._inflight.values()):
+                future.exception(timeout=5)
+
+    def test_open_breaker_skips_bad_subreddit(self, upstream, client):
+        _one_post_each(upstream)
+        upstream.failures.add("artificial")
+        self._fail(client, 3)
+        upstream.requests.clear()
+        upstream.delays["artificial"] = 1
+        feeds._cache.delete("feeds:hot:leadership")
+        start = time.monotonic()
+        resp = client.get("/api/feeds")
+        assert time.monotonic() - start < 1
+        assert len(resp.get_json()["posts"]) == 3
+        assert all("/artificial/" not in path for path, _ in upstream.requests)
+
+    def test_open_breaker_serves_stale_copy(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        upstream.failures.add("artificial")
+        entry = feed_cache.get("feeds:hot:artificial")
+        for _ in range(3):
+            entry["expires"] = time.time() - feeds.STALE_TTL - 1
+            feed_cache.set("feeds:hot:artificial", entry, 3600)
+            self._fail(client, 1)
+        assert feeds._source("artificial").breaker.state == "open"
+        titles = {p["title"] for p in client.get("/api/feeds").get_json()["posts"]}
+        assert "artificial" in titles
+
+    def test_status_reports_timings_and_failures(self, upstream, client):
+        _one_post_each(upstream)
+        upstream.failures.add("artificial")
+        self._fail(client, 3)
+        data = client.get("/api/feeds/status").get_json()
+        bad = data["sources"]["artificial"]
+        assert bad["state"] == "open"
+        assert bad["failures"] == 3
+        assert bad["consecutive_failures"] == 3
+        assert bad["retry_in"] > 0
+        assert "HTTP 500" in bad["last_error"]
+        good = data["sources"]["leadership"]
+        assert good["state"] == "closed"
+        assert good["refreshes"] == 1
+        assert good["failures"] == 0
+        assert good["last_duration_ms"] >= 0
+        assert data["prefetch"]["tracked"] == len(SUBREDDITS)
+
+
+class TestUpstreamClient:
+    def _expire(self, feed_cache):
+        # Past the stale window, so the next request waits for revalidation.
+        for sub in SUBREDDITS:
+            key = f"feeds:hot:{sub}"
+            entry = feed_cache.get(key)
+            entry["expires"] = time.time() - feeds.STALE_TTL - 1
+            feed_cache.set(key, entry, 3600)
+
+    def test_requests_gzip(self, upstream, client):
+        _one_post_each(upstream)
+        assert len(client.get("/api/feeds").get_json()["posts"]) == 4
+        assert all(h.get("Accept-Encoding") == "gzip" for _, h in upstream.requests)
+
+    def test_revalidates_with_etag(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        self._expire(feed_cache)
+        upstream.requests.clear()
+        resp = client.get("/api/feeds")
+        assert len(resp.get_json()["posts"]) == 4
+        assert all("If-None-Match" in h for _, h in upstream.requests)
+
+    def test_changed_listing_is_refetched(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        self._expire(feed_cache)
+        upstream.posts["artificial"] = [{"title": "Fresh", "score": 99}]
+        resp = client.get("/api/feeds")
+        assert resp.get_json()["posts"][0]["title"] == "Fresh"
+
+    def test_reuses_connections(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        client.get("/api/feeds")
+        for _ in range(3):
+            self._expire(feed_cache)
+            client.get("/api/feeds")
+        assert len(upstream.requests) == 4 * len(SUBREDDITS)
+        # Never more connections than fetches ever in flight at once.
+        assert upstream.connections <= len(SUBREDDITS)
+
+    def test_recovers_from_closed_idle_connection(self, upstream):
+        upstream.posts["leadership"] = [{"title": "x"}]
+        status, _, _ = feeds._http.get("/r/leadership/hot.json")
+        assert status == 200
+        # Simulate the server dropping the idle keep-alive connection.
+        idle = feeds._http._idle.get_nowait()
+        idle.sock.close()
+        feeds._http._idle.put_nowait(idle)
+        status, _, body = feeds._http.get("/r/leadership/hot.json")
+        assert status == 200
+        assert json.loads(body)["data"]["children"][0]["data"]["title"] == "x"
+
+
+class TestHeapMerge:
+    def test_merges_sorted_lists_by_score(self, upstream, client):
+        upstream.posts.update({
+            "leadership": [{"title": f"l{n}", "score": n} for n in (90, 10, 50)],
+            "management": [{"title": f"m{n}", "score": n} for n in (80, 20)],
+            "machinelearning": [{"title": "ml", "score": 60}],
+            "artificial": [],
+        })
+        posts = client.get("/api/feeds").get_json()["posts"]
+        assert [p["score"] for p in posts] == [90, 80, 60, 50, 20, 10]
+
+    def test_limit_takes_top_k(self, upstream):
+        upstream.posts.update(
+            {sub: [{"title": sub, "score": i} for i in range(15)] for sub in SUBREDDITS}
+        )
+        posts = feeds._get_posts(SUBREDDITS, "hot", limit=5)
+        assert [p["score"] for p in posts] == [14] * 4 + [13]
+
+
+class TestSubscriptions:
+    def test_requires_login(self, client, db):
+        assert client.get("/api/feeds/subscriptions").status_code == 401
+        resp = client.put("/api/feeds/subscriptions", json={"subreddits": ["python"]})
+        assert resp.status_code == 401
+
+    def test_defaults_until_subscribed(self, client, user):
+        login(client)
+        resp = client.get("/api/feeds/subscriptions")
+        assert resp.status_code == 200
+        assert resp.get_json() == {"subreddits": [], "default": SUBREDDITS}
+
+    def test_replace_normalizes_and_dedupes(self, client, user):
+        login(client)
+        resp = client.put(
+            "/api/feeds/subscriptions",
+            json={"subreddits": ["Python", "r/python", " golang "]},
+        )
+        assert resp.status_code == 200
+        assert resp.get_json()["subreddits"] == ["python", "golang"]
+        client.put("/api/feeds/subscriptions", json={"subreddits": ["rust"]})
+        assert client.get("/api/feeds/subscriptions").get_json()["subreddits"] == ["rust"]
+
+    def test_rejects_invalid_names(self, client, user):
+        login(client)
+        resp = client.put(
+            "/api/feeds/subscriptions", json={"subreddits": ["ok", "../etc"]}
+        )
+        assert resp.status_code == 400
+        resp = client.put("/api/feeds/subscriptions", json={"subreddits": "python"})
+        assert resp.status_code == 400
+
+    def test_rejects_too_many(self, client, user):
+        login(client)
+        names = [f"sub{i}" for i in range(feeds.MAX_SUBSCRIPTIONS + 1)]
+        resp = client.put("/api/feeds/subscriptions", json={"subreddits": names})
+        assert resp.status_code == 400
+
+    def test_feed_uses_subscriptions(self, upstream, client, user):
+        login(client)
+        upstream.posts.update({"python": [{"title": "py"}], "golang": [{"title": "go"}]})
+        client.put("/api/feeds/subscriptions", json={"subreddits": ["python", "golang"]})
+        titles = {p["title"] for p in client.get("/api/feeds").get_json()["posts"]}
+        assert titles == {"py", "go"}
+        assert {path.split("/")[2] for path, _ in upstream.requests} == {"python", "golang"}
+
+    def test_overlapping_subscriptions_share_fetches(self, upstream, app, user, other_user):
+        upstream.posts.update({s: [{"title": s}] for s in ("python", "golang", "rust")})
+        for creds, subs in (
+            (("alice", "password123"), ["python", "golang"]),
+            (("bob", "password456"), ["golang", "rust"]),
+        ):
+            c = app.test_client()
+            login(c, *creds)
+            c.put("/api/feeds/subscriptions", json={"subreddits": subs})
+            assert len(c.get("/api/feeds").get_json()["posts"]) == 2
+        paths = sorted(path for path, _ in upstream.requests)
+        assert [p.split("/")[2] for p in paths] == ["golang", "python", "rust"]
+
+    def test_subscriptions_removed_with_user(self, client, db, user):
+        login(client)
+        client.put("/api/feeds/subscriptions", json={"subreddits": ["python"]})
+        db.session.delete(db.session.get(User, user.id))
+        db.session.commit()
+        assert FeedSubscription.query.count() == 0
+
+
+class TestConditionalFeed:
+    def _expire(self, feed_cache):
+        for sub in SUBREDDITS:
+            key = f"feeds:hot:{sub}"
+            entry = feed_cache.get(key)
+            entry["expires"] = time.time() - feeds.STALE_TTL - 1
+            feed_cache.set(key, entry, 3600)
+
+    def test_not_modified_while_entries_unchanged(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        etag = client.get("/api/feeds").headers["ETag"]
+        resp = client.get("/api/feeds", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        # An upstream 304 keeps the entry, and with it the ETag.
+        self._expire(feed_cache)
+        resp = client.get("/api/feeds", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+    def test_changed_listing_changes_etag(self, upstream, client, feed_cache):
+        _one_post_each(upstream)
+        etag = client.get("/api/feeds").headers["ETag"]
+        self._expire(feed_cache)
+        upstream.posts["artificial"] = [{"title": "Fresh", "score": 99}]
+        resp = client.get("/api/feeds", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        assert client.get("/api/feeds?sort=new").headers.get("ETag") != etag
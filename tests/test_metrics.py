@@ -0,0 +1,100 @@
+import logging
+
+from conftest import login
+from metrics import _Histogram, _labels, metrics
+
+METRICS_AUTH = {"Authorization": "Bearer test-metrics-token"}
+
+
+def _samples(client):
+    resp = client.get("/api/_metrics", headers=METRICS_AUTH)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    samples = {}
+    for line in resp.get_data(as_text=True).splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+class TestMetricsEndpoint:
+    def test_counts_requests_by_endpoint(self, client, user):
+        login(client)
+        client.get("/api/todos")
+        client.get("/api/todos")
+        samples = _samples(client)
+        key = 'http_requests_total{endpoint="todos.index",method="GET",status="200"}'
+        assert samples[key] == 2
+        count = 'http_request_duration_seconds_count{endpoint="todos.index",method="GET"}'
+        inf = 'http_request_duration_seconds_bucket{endpoint="todos.index",method="GET",le="+Inf"}'
+        assert samples[count] == 2
+        assert samples[inf] == 2
+
+    def test_records_sql_and_response_size(self, client, user):
+        login(client)
+        client.post("/api/todos", json={"title": "Write tests"})
+        samples = _samples(client)
+        assert samples['http_request_sql_queries_sum{endpoint="todos.add"}'] >= 1
+        assert samples['http_request_sql_seconds_total{endpoint="todos.add"}'] > 0
+        assert samples['http_response_size_bytes_sum{endpoint="todos.add"}'] > 0
+
+    def test_unmatched_urls_share_one_label(self, client, db):
+        client.post("/api/nope/1")
+        client.post("/api/nope/2")
+        samples = _samples(client)
+        assert samples[
+            'http_requests_total{endpoint="unmatched",method="POST",status="405"}'
+        ] == 2
+
+
+class TestMetricsAccess:
+    def test_requires_token(self, client, db):
+        assert client.get("/api/_metrics").status_code == 401
+        resp = client.get("/api/_metrics", headers={"Authorization": "Bearer nope"})
+        assert resp.status_code == 401
+
+    def test_off_without_token(self, app, client, db, monkeypatch):
+        monkeypatch.setitem(app.config, "METRICS_TOKEN", "")
+        resp = client.get("/api/_metrics", headers={"Authorization": "Bearer "})
+        assert resp.status_code == 404
+
+
+class TestSlowQueryLog:
+    def test_logs_statement_and_route(self, app, client, user, caplog, monkeypatch):
+        login(client)
+        monkeypatch.setitem(app.config, "SLOW_QUERY_THRESHOLD", 0)
+        with caplog.at_level(logging.WARNING, logger="metrics"):
+            client.post("/api/todos", json={"title": "Slow todo"})
+        messages = [r.getMessage() for r in caplog.records if r.name == "metrics"]
+        insert = next(m for m in messages if "INSERT INTO todo" in m)
+        assert "POST /api/todos/ (todos.add)" in insert
+        assert "Slow todo" not in insert
+        samples = _samples(client)
+        assert samples['sql_slow_queries_total{endpoint="todos.add"}'] >= 1
+
+    def test_fast_queries_not_logged(self, client, user, caplog):
+        login(client)
+        with caplog.at_level(logging.WARNING, logger="metrics"):
+            client.get("/api/todos")
+        assert not [r for r in caplog.records if r.name == "metrics"]
+
+
+class TestRendering:
+    def test_histogram_buckets(self):
+        hist = _Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            hist.observe(value)
+        assert hist.counts == [2, 1]
+        assert hist.count == 4
+        assert hist.sum == 14.5
+
+    def test_escapes_label_values(self):
+        assert _labels(("path",), ('a"b\\c\nd',)) == '{path="a\\"b\\\\c\\nd"}'
+
+    def test_render_after_clear(self):
+        metrics.clear()
+        text = metrics.render()
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        assert "# TYPE http_requests_total counter" in text
+
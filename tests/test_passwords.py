@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from conftest import login
+from models import User
+from passwords import HashingBusy, hash_iterations, hasher
+
+
+@pytest.fixture()
+def pool(app, monkeypatch):
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_QUEUE", 2)
+    hasher.close()
+    yield hasher
+    hasher.close()
+
+
+class TestHashIterations:
+    def test_reads_iterations(self):
+        assert hash_iterations("pbkdf2:sha256:1000$salt$abc") == 1000
+
+    def test_defaults_when_unspecified(self):
+        from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+        assert hash_iterations("pbkdf2:sha256$salt$abc") == DEFAULT_PBKDF2_ITERATIONS
+
+    def test_other_methods(self):
+        assert hash_iterations("scrypt:32768:8:1$salt$abc") is None
+        assert hash_iterations("pbkdf2:sha1:1000$salt$abc") is None
+
+
+class TestPasswordHasher:
+    def test_uses_configured_cost(self, app):
+        password_hash = hasher.hash("secret")
+        assert hash_iterations(password_hash) == app.config["PASSWORD_HASH_ITERATIONS"]
+        assert hasher.verify(password_hash, "secret")
+        assert not hasher.verify(password_hash, "wrong")
+
+    def test_needs_rehash_when_cost_changes(self, app, monkeypatch):
+        password_hash = hasher.hash("secret")
+        assert not hasher.needs_rehash(password_hash)
+        monkeypatch.setitem(app.config, "PASSWORD_HASH_ITERATIONS", 2000)
+        assert hasher.needs_rehash(password_hash)
+
+    def test_hashes_on_process_pool(self, pool):
+        password_hash = pool.hash("secret")
+        assert pool._pool is not None
+        assert pool.verify(password_hash, "secret")
+        assert not pool.verify(password_hash, "wrong")
+
+    def test_fails_fast_when_queue_is_full(self, pool):
+        pool.hash("warm up")
+        _, slots = pool._executor()
+        assert slots.acquire(blocking=False)
+        assert slots.acquire(blocking=False)
+        try:
+            start = time.monotonic()
+            with pytest.raises(HashingBusy):
+                pool.hash("secret")
+            assert time.monotonic() - start < 0.1
+        finally:
+            slots.release()
+            slots.release()
+
+    def test_times_out(self, pool, app, monkeypatch):
+        pool.hash("warm up")
+        monkeypatch.setitem(app.config, "PASSWORD_HASH_ITERATIONS", 5_000_000)
+        monkeypatch.setitem(app.config, "PASSWORD_HASH_TIMEOUT", 0.01)
+        with pytest.raises(HashingBusy):
+            pool.hash("secret")
+
+
+class TestLoginRehash:
+    def test_login_upgrades_hash_cost(self, client, user, app, monkeypatch):
+        monkeypatch.setitem(app.config, "PASSWORD_HASH_ITERATIONS", 2000)
+        resp = login(client)
+        assert resp.status_code == 200
+        stored = User.query.filter_by(username="alice").first().password_hash
+        assert hash_iterations(stored) == 2000
+        client.post("/api/logout")
+        assert login(client).status_code == 200
+
+    def test_failed_login_keeps_hash(self, client, user, app, monkeypatch):
+        before = user.password_hash
+        monkeypatch.setitem(app.config, "PASSWORD_HASH_ITERATIONS", 2000)
+        assert login(client, "alice", "wrong").status_code == 401
+        assert User.query.filter_by(username="alice").first().password_hash == before
+
+    def test_busy_hasher_returns_503(self, client, user, monkeypatch):
+        def busy(*args):
+            raise HashingBusy("full")
+
+        monkeypatch.setattr(hasher, "verify", busy)
+        resp = login(client)
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+        monkeypatch.setattr(hasher, "hash", busy)
+        resp = client.post("/api/signup", json={"username": "carol", "password": "pw"})
+        assert resp.status_code == 503
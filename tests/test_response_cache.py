@@ -0,0 +1,162 @@
+import pytest
+from sqlalchemy import text
+
+from cache import cache_from_url
+from conftest import count_queries, login
+from metrics import metrics
+from models import Article, Category, Comment
+from response_cache import response_cache
+from versions import versions
+
+
+def _lookups(endpoint, result):
+    return metrics._response_cache[(endpoint, result)]
+
+
+@pytest.fixture()
+def article(db):
+    article = Article(title="A", author="a")
+    db.session.add(article)
+    db.session.commit()
+    return article.id
+
+
+class TestResponseCache:
+    def test_hit_runs_no_queries(self, client, db, article):
+        first = client.get("/api/articles")
+        with count_queries(db) as queries:
+            second = client.get("/api/articles")
+        assert second.get_json() == first.get_json()
+        assert second.headers["ETag"] == first.headers["ETag"]
+        assert queries == []
+        assert _lookups("articles.list_articles", "hit") == 1
+        assert _lookups("articles.list_articles", "miss") == 1
+
+    def test_generation_bump_misses(self, client, db, article):
+        client.get(f"/api/articles/{article}")
+        db.session.add(Comment(description="new", article_id=article))
+        db.session.commit()
+        data = client.get(f"/api/articles/{article}").get_json()
+        assert [c["description"] for c in data["article"]["comments"]] == ["new"]
+        assert _lookups("articles.detail", "miss") == 2
+
+    def test_unrelated_writes_keep_entries(self, client, db, user, article):
+        client.get("/api/articles")
+        login(client)
+        client.post("/api/todos", json={"title": "t"})
+        client.get("/api/articles")
+        assert _lookups("articles.list_articles", "hit") == 1
+
+    def test_new_tag_misses(self, client, user, article):
+        login(client)
+        client.get("/api/articles")
+        client.post("/api/articles", json={"title": "B", "tags": "fresh"})
+        data = client.get("/api/articles").get_json()
+        assert data["articles"][-1]["tags"] == ["fresh"]
+        assert _lookups("articles.list_articles", "hit") == 0
+
+    def test_errors_not_cached(self, client, db):
+        client.get("/api/articles/999")
+        client.get("/api/articles/999")
+        assert _lookups("articles.detail", "miss") == 2
+
+    def test_hit_keeps_view_headers(self, client, db):
+        db.session.add(Category(name="Science"))
+        db.session.commit()
+        etag = client.get("/api/categories").headers["ETag"]
+        resp = client.get("/api/categories")
+        assert _lookups("categories.list_categories", "hit") == 1
+        assert resp.headers["ETag"] == etag
+        assert resp.mimetype == "application/json"
+        resp = client.get("/api/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+    def test_lru_bound(self, app, client, db, article):
+        app.config["RESPONSE_CACHE_SIZE"] = 2
+        try:
+            response_cache.clear()
+            for url in ("/api/articles", "/api/articles?limit=1", "/api/articles?limit=2"):
+                client.get(url)
+            client.get("/api/articles")
+            assert _lookups("articles.list_articles", "hit") == 0
+            client.get("/api/articles?limit=2")
+            assert _lookups("articles.list_articles", "hit") == 1
+        finally:
+            app.config["RESPONSE_CACHE_SIZE"] = 1024
+            response_cache.clear()
+
+    def test_file_backend_shared(self, app, client, db, article, tmp_path):
+        app.config["RESPONSE_CACHE_URL"] = f"sqlite:///{tmp_path}/responses.db"
+        try:
+            response_cache.clear()
+            client.get("/api/articles")
+            # A fresh backend on the same file, as another worker would have.
+            response_cache.clear()
+            with count_queries(db) as queries:
+                data = client.get("/api/articles").get_json()
+            assert data["articles"][0]["title"] == "A"
+            assert _lookups("articles.list_articles", "hit") == 1
+            assert queries == []
+        finally:
+            app.config["RESPONSE_CACHE_URL"] = "memory://"
+            response_cache.clear()
+
+    def test_off_without_shared_stamps(self, app, client, db, article):
+        app.config["TESTING"] = False
+        try:
+            client.get("/api/articles")
+            with count_queries(db) as queries:
+                client.get("/api/articles")
+            assert queries
+            assert "response_cache_lookups_total{" not in metrics.render()
+        finally:
+            app.config["TESTING"] = True
+
+    def test_memory_entries_follow_shared_stamps(self, app, client, db, article, tmp_path):
+        app.config.update(TESTING=False, VERSION_CACHE_URL=f"sqlite:///{tmp_path}/v.db")
+        try:
+            versions.clear()
+            client.get("/api/articles")
+            # Another worker commits: only the shared stamp records it.
+            versions.bump("version:article")
+            client.get("/api/articles")
+            assert _lookups("articles.list_articles", "miss") == 2
+        finally:
+            app.config.update(TESTING=True, VERSION_CACHE_URL="memory://")
+            versions.clear()
+
+    def test_other_workers_category_change(self, app, client, db, tmp_path):
+        art = Category(name="Art")
+        db.session.add(art)
+        db.session.commit()
+        db.session.add(Article(title="A", author="a", category_id=art.id))
+        db.session.commit()
+        stamps = f"sqlite:///{tmp_path}/versions.db"
+        app.config.update(VERSION_CACHE_URL=stamps,
+                          RESPONSE_CACHE_URL=f"sqlite:///{tmp_path}/responses.db")
+        try:
+            versions.clear()
+            response_cache.clear()
+            assert client.get("/api/articles").get_json()["articles"][0]["category"] == "Art"
+            # Another worker renames the category and replaces the shared stamp.
+            db.session.execute(text("UPDATE category SET name = 'Arts'"))
+            db.session.commit()
+            cache_from_url(stamps).set("version:category", "other-worker", 60)
+            for _ in range(2):
+                data = client.get("/api/articles").get_json()
+                assert data["articles"][0]["category"] == "Arts"
+                response_cache.clear()  # the next request comes from a fresh worker
+        finally:
+            app.config.update(VERSION_CACHE_URL="memory://", RESPONSE_CACHE_URL="memory://")
+            versions.clear()
+            response_cache.clear()
+
+    def test_lookups_exported(self, client, db, article):
+        client.get("/api/articles")
+        client.get("/api/articles")
+        text = client.get("/api/_metrics", headers={
+            "Authorization": "Bearer test-metrics-token"}).get_data(as_text=True)
+        assert ('response_cache_lookups_total{endpoint="articles.list_articles",'
+                'result="hit"} 1') in text
+        assert ('response_cache_lookups_total{endpoint="articles.list_articles",'
+                'result="miss"} 1') in text
@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import count_queries
+from shortcodes import ShortCodeAllocator, allocator, encode_base62
+
+
+class TestEncodeBase62:
+    def test_pads_to_length(self):
+        assert encode_base62(0, 4) == "aaaa"
+        assert encode_base62(61, 2) == "a9"
+
+
+class TestShortCodeAllocator:
+    def test_codes_are_unique_across_whole_keyspace(self, app):
+        codes = {allocator.allocate(2) for _ in range(62 ** 2)}
+        assert len(codes) == 62 ** 2
+        with pytest.raises(RuntimeError):
+            allocator.allocate(2)
+
+    def test_codes_do_not_look_sequential(self, app):
+        codes = [allocator.allocate(6) for _ in range(5)]
+        assert codes != sorted(codes)
+        assert len({c[:4] for c in codes}) > 1
+
+    def test_reserves_one_block_per_block_size(self, app, db):
+        with count_queries(db) as queries:
+            for _ in range(allocator.block_size * 2):
+                allocator.allocate(6)
+        assert len([q for q in queries if q.lstrip().upper().startswith("UPDATE")]) == 2
+
+    def test_workers_get_disjoint_blocks(self, app):
+        other = ShortCodeAllocator()
+        other.init_app(app)
+        mine = {allocator.allocate(6) for _ in range(150)}
+        theirs = {other.allocate(6) for _ in range(150)}
+        assert not mine & theirs
+
+    def test_key_changes_the_mapping(self, app):
+        other = ShortCodeAllocator()
+        other.key = b"another-key"
+        assert other._permute(1, 62 ** 6) != allocator._permute(1, 62 ** 6)
+
+    def test_length_must_fit_the_column(self, app, monkeypatch):
+        for length in (0, 11):
+            monkeypatch.setitem(app.config, "SHORT_CODE_LENGTH", length)
+            with pytest.raises(ValueError):
+                ShortCodeAllocator().init_app(app)
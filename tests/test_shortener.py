@@ -1,4 +1,8 @@
-from conftest import login
+from datetime import datetime
+from unittest.mock import patch
+
+from conftest import count_queries, login
+from clicks import click_counter
 from models import ShortUrl
 
 
@@ -30,6 +34,20 @@ class TestShortenerIndex:
         assert resp.status_code == 200
         assert resp.get_json()["short_urls"] == []
 
+    def test_index_paginates(self, client, user, db):
+        for i in range(3):
+            db.session.add(ShortUrl(short_code=f"page{i}", original_url="https://e.com",
+                                    user_id=user.id, created_at=datetime(2026, 1, 1 + i)))
+        db.session.commit()
+        login(client)
+        resp = client.get("/api/shortener?limit=2")
+        first = resp.get_json()
+        assert [u["short_code"] for u in first["short_urls"]] == ["page2", "page1"]
+        resp = client.get(f"/api/shortener?limit=2&cursor={first['next_cursor']}")
+        second = resp.get_json()
+        assert len(second["short_urls"]) == 1
+        assert second["next_cursor"] is None
+
 
 class TestShortenerAdd:
     def test_add_requires_login(self, client, db):
@@ -47,6 +65,24 @@ class TestShortenerAdd:
         assert su["click_count"] == 0
         assert su["user_id"] == user.id
 
+    def test_add_does_not_probe_for_existing_codes(self, client, user, db):
+        login(client)
+        client.post("/api/shortener", json={"original_url": "https://warm.up"})
+        with count_queries(db) as queries:
+            client.post("/api/shortener", json={"original_url": "https://example.com"})
+        assert not [q for q in queries if "WHERE short_url.short_code" in q]
+
+    def test_add_skips_codes_taken_by_legacy_rows(self, client, user, db):
+        db.session.add(ShortUrl(short_code="legacy", original_url="https://old.com",
+                                user_id=user.id))
+        db.session.commit()
+        login(client)
+        with patch("routes.shortener._generate_short_code",
+                   side_effect=["legacy", "fresh1"]):
+            resp = client.post("/api/shortener", json={"original_url": "https://new.com"})
+        assert resp.status_code == 201
+        assert resp.get_json()["short_url"]["short_code"] == "fresh1"
+
     def test_add_missing_url_returns_400(self, client, user):
         login(client)
         resp = client.post("/api/shortener", json={})
@@ -101,10 +137,139 @@ class TestShortUrlRedirect:
         assert su.click_count == 0
         client.get(f"/s/{su.short_code}")
         client.get(f"/s/{su.short_code}")
+        click_counter.flush()
         db.session.expire_all()
         su_refreshed = ShortUrl.query.first()
         assert su_refreshed.click_count == 2
 
+    def test_redirect_survives_malformed_referrer(self, client, user, db):
+        login(client)
+        client.post("/api/shortener", json={"original_url": "https://example.com"})
+        su = ShortUrl.query.first()
+        resp = client.get(f"/s/{su.short_code}", headers={"Referer": "http://[bad/"})
+        assert resp.status_code == 302
+        click_counter.flush()
+        db.session.expire_all()
+        assert ShortUrl.query.first().click_count == 1
+
     def test_redirect_invalid_code_404(self, client, db):
         resp = client.get("/s/nonexistent")
         assert resp.status_code == 404
+
+
+class TestRedirectCache:
+    def _create(self, client):
+        login(client)
+        resp = client.post("/api/shortener", json={"original_url": "https://example.com"})
+        return resp.get_json()["short_url"]
+
+    def test_cache_hit_skips_lookup(self, client, user, db):
+        su = self._create(client)
+        client.get(f"/s/{su['short_code']}")
+        with count_queries(db) as queries:
+            resp = client.get(f"/s/{su['short_code']}")
+        assert resp.headers["Location"] == "https://example.com"
+        assert not [q for q in queries if q.lstrip().upper().startswith("SELECT")]
+
+    def test_unknown_code_is_negatively_cached(self, client, db):
+        client.get("/s/missing")
+        with count_queries(db) as queries:
+            resp = client.get("/s/missing")
+        assert resp.status_code == 404
+        assert queries == []
+
+    def test_create_clears_negative_entry(self, client, user):
+        assert client.get("/s/fresh1").status_code == 404
+        with patch("routes.shortener._generate_short_code", return_value="fresh1"):
+            self._create(client)
+        assert client.get("/s/fresh1").status_code == 302
+
+    def test_delete_invalidates_cached_code(self, client, user):
+        su = self._create(client)
+        assert client.get(f"/s/{su['short_code']}").status_code == 302
+        client.delete(f"/api/shortener/{su['id']}")
+        assert client.get(f"/s/{su['short_code']}").status_code == 404
+
+
+class TestClickCounter:
+    def test_redirect_does_not_write(self, client, user, db):
+        login(client)
+        client.post("/api/shortener", json={"original_url": "https://example.com"})
+        su = ShortUrl.query.first()
+        client.get(f"/s/{su.short_code}")
+        with count_queries(db) as queries:
+            client.get(f"/s/{su.short_code}")
+        assert queries == []
+        assert click_counter.pending(su.id) == 2
+
+    def test_flush_aggregates_per_code(self, client, user, db):
+        for code in ("aaa111", "bbb222"):
+            db.session.add(ShortUrl(short_code=code, original_url="https://a.com",
+                                    user_id=user.id))
+        db.session.commit()
+        for _ in range(5):
+            client.get("/s/aaa111")
+        client.get("/s/bbb222")
+        with count_queries(db) as queries:
+            assert click_counter.flush() == 2
+        assert len([q for q in queries if q.lstrip().upper().startswith("UPDATE")]) == 1
+        db.session.expire_all()
+        counts = {su.short_code: su.click_count for su in ShortUrl.query.all()}
+        assert counts == {"aaa111": 5, "bbb222": 1}
+        assert click_counter.flush() == 0
+
+    def test_index_includes_pending_clicks(self, client, user):
+        login(client)
+        client.post("/api/shortener", json={"original_url": "https://example.com"})
+        su = ShortUrl.query.first()
+        client.get(f"/s/{su.short_code}")
+        resp = client.get("/api/shortener")
+        assert resp.get_json()["short_urls"][0]["click_count"] == 1
+
+
+class TestShortenerStats:
+    def _setup(self, client, user, db):
+        su = ShortUrl(short_code="stat01", original_url="https://a.com", user_id=user.id)
+        db.session.add(su)
+        db.session.commit()
+        return su
+
+    def test_stats_requires_owner(self, client, user, other_user, db):
+        su = ShortUrl(short_code="bob001", original_url="https://bob.com",
+                      user_id=other_user.id)
+        db.session.add(su)
+        db.session.commit()
+        login(client)
+        assert client.get(f"/api/shortener/{su.id}/stats").status_code == 403
+        assert client.get("/api/shortener/999/stats").status_code == 404
+
+    def test_stats_breaks_down_clicks(self, client, user, db, monkeypatch):
+        su = self._setup(client, user, db)
+        monkeypatch.setattr(click_counter, "_clock", lambda: datetime(2026, 3, 1, 9, 15))
+        client.get("/s/stat01", headers={"Referer": "https://news.example.org/x",
+                                         "User-Agent": "Mozilla/5.0 Firefox/120.0"})
+        client.get("/s/stat01", headers={"User-Agent": "curl/8.0"})
+        monkeypatch.setattr(click_counter, "_clock", lambda: datetime(2026, 3, 1, 10, 5))
+        client.get("/s/stat01", headers={"User-Agent": "Googlebot/2.1"})
+        click_counter.flush()
+        login(client)
+        stats = client.get(f"/api/shortener/{su.id}/stats").get_json()["stats"]
+        assert stats["total"] == 3
+        assert stats["series"] == [
+            {"bucket": "2026-03-01T09:00:00", "clicks": 2},
+            {"bucket": "2026-03-01T10:00:00", "clicks": 1},
+        ]
+        assert {r["referrer"]: r["clicks"] for r in stats["referrers"]} == {
+            "news.example.org": 1, "": 2,
+        }
+        assert {a["agent"] for a in stats["agents"]} == {"firefox", "curl", "bot"}
+        resp = client.get(f"/api/shortener/{su.id}/stats?granularity=day")
+        assert resp.get_json()["stats"]["series"] == [
+            {"bucket": "2026-03-01T00:00:00", "clicks": 3},
+        ]
+
+    def test_stats_invalid_granularity(self, client, user, db):
+        su = self._setup(client, user, db)
+        login(client)
+        resp = client.get(f"/api/shortener/{su.id}/stats?granularity=week")
+        assert resp.status_code == 400
@@ -0,0 +1,121 @@
+import gzip
+import os
+
+import pytest
+
+from app import FRONTEND_DIST
+from static_assets import IMMUTABLE, assets, compress_tree
+
+INDEX = (b"<!doctype html><html><head><title>App</title></head><body><div id=root></div>"
+         + b" " * 600 + b"</body></html>")
+SCRIPT = b"console.log('hello');" * 50
+
+
+def _write(root, name, data):
+    path = os.path.join(root, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture()
+def dist(tmp_path, app):
+    root = str(tmp_path)
+    _write(root, "index.html", INDEX)
+    _write(root, "assets/index-B1a2C3d4.js", SCRIPT)
+    _write(root, "assets/index-B1a2C3d4.js.gz", gzip.compress(SCRIPT))
+    _write(root, "favicon.svg", b"<svg/>")
+    assets.load(root)
+    yield root
+    assets.load(FRONTEND_DIST)
+
+
+class TestManifest:
+    def test_scans_tree_once(self, dist, client, monkeypatch):
+        def fail(*args):
+            raise AssertionError("filesystem lookup during a request")
+        monkeypatch.setattr(os.path, "isfile", fail)
+        monkeypatch.setattr(os.path, "exists", fail)
+        assert "assets/index-B1a2C3d4.js" in assets
+        assert "assets/index-B1a2C3d4.js.gz" not in assets
+        assert b"<div id=root>" in client.get("/").data
+        assert b"<div id=root>" in client.get("/todos/3").data
+
+    def test_api_miss_skips_manifest(self, dist, client, monkeypatch):
+        monkeypatch.setattr(assets, "response", None)
+        resp = client.get("/api/nope")
+        assert resp.status_code == 404
+        assert resp.get_json() == {"error": "Not found"}
+
+    def test_missing_build_returns_404(self, tmp_path, client):
+        assets.load(str(tmp_path / "missing"))
+        try:
+            assert client.get("/").status_code == 404
+        finally:
+            assets.load(FRONTEND_DIST)
+
+
+class TestAssetResponses:
+    def test_fingerprinted_asset_is_immutable(self, dist, client):
+        resp = client.get("/assets/index-B1a2C3d4.js")
+        assert resp.status_code == 200
+        assert resp.headers["Cache-Control"] == IMMUTABLE
+        assert resp.mimetype == "text/javascript"
+        assert resp.data == SCRIPT
+
+    def test_unfingerprinted_asset_revalidates(self, dist, client):
+        resp = client.get("/favicon.svg")
+        assert resp.headers["Cache-Control"] == "no-cache"
+        etag = resp.headers["ETag"]
+        resp = client.get("/favicon.svg", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+    def test_serves_precompressed_sibling(self, dist, client):
+        resp = client.get("/assets/index-B1a2C3d4.js",
+                          headers={"Accept-Encoding": "gzip, deflate"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        assert gzip.decompress(resp.data) == SCRIPT
+        plain = client.get("/assets/index-B1a2C3d4.js")
+        assert "Content-Encoding" not in plain.headers
+        assert plain.headers["ETag"] != resp.headers["ETag"]
+
+    def test_respects_zero_quality(self, dist, client):
+        resp = client.get("/assets/index-B1a2C3d4.js",
+                          headers={"Accept-Encoding": "gzip;q=0"})
+        assert "Content-Encoding" not in resp.headers
+        assert resp.data == SCRIPT
+
+
+class TestIndex:
+    def test_index_etag_and_conditional_get(self, dist, client):
+        resp = client.get("/")
+        assert resp.headers["Cache-Control"] == "no-cache"
+        assert resp.mimetype == "text/html"
+        resp = client.get("/articles", headers={"If-None-Match": resp.headers["ETag"]})
+        assert resp.status_code == 304
+        assert resp.data == b""
+
+    def test_index_compressed_in_memory(self, dist, client):
+        resp = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert b"<div id=root>" in gzip.decompress(resp.data)
+
+
+class TestCompressTree:
+    def test_writes_smaller_siblings(self, tmp_path):
+        root = str(tmp_path)
+        _write(root, "index.html", INDEX)
+        _write(root, "assets/app-abcdefgh.css", b"a")
+        _write(root, "assets/logo-abcdefgh.png", SCRIPT)
+        assert compress_tree(root) >= 1
+        assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == INDEX
+        assert not (tmp_path / "assets" / "app-abcdefgh.css.gz").exists()
+        assert not (tmp_path / "assets" / "logo-abcdefgh.png.gz").exists()
+
+    def test_cli_command(self, runner, monkeypatch, tmp_path):
+        _write(str(tmp_path), "index.html", INDEX)
+        monkeypatch.setattr("app.FRONTEND_DIST", str(tmp_path))
+        result = runner.invoke(args=["compress-assets"])
+        assert result.exit_code == 0
+        assert (tmp_path / "index.html.gz").exists()
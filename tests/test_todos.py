@@ -1,4 +1,5 @@
 from conftest import login
+from pagination import encode_cursor
 from models import Todo
 
 
@@ -16,6 +17,35 @@ class TestTodoIndex:
         assert len(todos) == 1
         assert todos[0]["title"] == "Buy milk"
         assert todos[0]["author"] == "legacy"
+        assert resp.get_json()["next_cursor"] is None
+
+    def test_index_paginates_with_cursor(self, client, db):
+        for i in range(5):
+            db.session.add(Todo(title=f"T{i}", author="legacy"))
+        db.session.commit()
+        titles = []
+        cursor = ""
+        while True:
+            resp = client.get(f"/api/todos?limit=2&cursor={cursor}")
+            data = resp.get_json()
+            titles.extend(t["title"] for t in data["todos"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert titles == ["T0", "T1", "T2", "T3", "T4"]
+
+    def test_index_invalid_cursor(self, client, db):
+        resp = client.get("/api/todos?cursor=not-a-cursor")
+        assert resp.status_code == 400
+
+    def test_index_cursor_with_wrong_types(self, client, db):
+        for values in ([{"a": 1}], ["1"], [True], [1.5], [[1]]):
+            resp = client.get(f"/api/todos?cursor={encode_cursor(values)}")
+            assert resp.status_code == 400, values
+
+    def test_index_invalid_limit(self, client, db):
+        resp = client.get("/api/todos?limit=0")
+        assert resp.status_code == 400
 
 
 class TestTodoAdd:
@@ -0,0 +1,122 @@
+from conftest import count_queries, login
+from clicks import click_counter
+from models import Article, Bookmark, Comment, ShortUrl, Todo
+from versions import versions
+
+
+def _etag(client, url):
+    resp = client.get(url)
+    assert resp.status_code == 200
+    return resp.headers["ETag"]
+
+
+def _status(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag}).status_code
+
+
+class TestConditionalGet:
+    def test_not_modified_without_queries(self, client, db):
+        db.session.add(Article(title="A", author="a"))
+        db.session.commit()
+        etag = _etag(client, "/api/articles")
+        with count_queries(db) as queries:
+            resp = client.get("/api/articles", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.data == b""
+        assert resp.headers["ETag"] == etag
+        assert queries == []
+
+    def test_write_changes_etag(self, client, db):
+        etag = _etag(client, "/api/articles")
+        db.session.add(Article(title="A", author="a"))
+        db.session.commit()
+        assert _status(client, "/api/articles", etag) == 200
+
+    def test_query_string_is_part_of_etag(self, client, db):
+        etag = _etag(client, "/api/articles")
+        assert _status(client, "/api/articles?tag=x", etag) == 200
+
+    def test_uncommitted_write_keeps_etag(self, client, db):
+        etag = _etag(client, "/api/todos")
+        db.session.add(Todo(title="t"))
+        db.session.flush()
+        db.session.rollback()
+        assert _status(client, "/api/todos", etag) == 304
+
+    def test_detail_tracks_comments(self, client, db):
+        article = Article(title="A", author="a")
+        db.session.add(article)
+        db.session.commit()
+        url = f"/api/articles/{article.id}"
+        etag = _etag(client, url)
+        assert _status(client, url, etag) == 304
+        db.session.add(Comment(description="c", article_id=article.id))
+        db.session.commit()
+        assert _status(client, url, etag) == 200
+
+    def test_errors_carry_no_etag(self, client, db):
+        resp = client.get("/api/articles/999")
+        assert resp.status_code == 404
+        assert "ETag" not in resp.headers
+
+    def test_bulk_statement_changes_etag(self, client, db):
+        db.session.add(Todo(title="t"))
+        db.session.commit()
+        etag = _etag(client, "/api/todos")
+        Todo.query.filter_by(title="t").update({"done": True})
+        db.session.commit()
+        assert _status(client, "/api/todos", etag) == 200
+
+
+class TestPerUserVersions:
+    def test_only_own_writes_change_etag(self, client, db, user, other_user):
+        login(client)
+        etag = _etag(client, "/api/bookmarks")
+        db.session.add(Bookmark(url="https://bob.example", title="b", user_id=other_user.id))
+        db.session.commit()
+        resp = client.get("/api/bookmarks", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["Cache-Control"] == "private, no-cache"
+        client.post("/api/bookmarks", json={"url": "https://example.com", "title": "Mine"})
+        assert _status(client, "/api/bookmarks", etag) == 200
+
+    def test_clicks_change_short_url_etag(self, client, db, user):
+        login(client)
+        code = client.post("/api/shortener", json={"original_url": "https://example.com"}
+                           ).get_json()["short_url"]["short_code"]
+        etag = _etag(client, "/api/shortener")
+        assert _status(client, "/api/shortener", etag) == 304
+        client.get(f"/s/{code}")
+        resp = client.get("/api/shortener", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.get_json()["short_urls"][0]["click_count"] == 1
+        etag = resp.headers["ETag"]
+        # Another worker's flush is a Core UPDATE; it bumps every owner.
+        db.session.execute(ShortUrl.__table__.update().values(click_count=5))
+        db.session.commit()
+        assert _status(client, "/api/shortener", etag) == 200
+        click_counter.clear()
+
+
+class TestVersionBackend:
+    def test_memory_stamps_off_outside_testing(self, app, client, db):
+        app.config["TESTING"] = False
+        try:
+            resp = client.get("/api/todos")
+            assert "ETag" not in resp.headers
+            resp = client.get("/api/todos", headers={"If-None-Match": "*"})
+            assert resp.status_code == 200
+        finally:
+            app.config["TESTING"] = True
+
+    def test_file_stamps_shared_between_workers(self, app, client, db, tmp_path):
+        app.config.update(TESTING=False, VERSION_CACHE_URL=f"sqlite:///{tmp_path}/v.db")
+        try:
+            versions.clear()
+            etag = _etag(client, "/api/todos")
+            # A fresh backend on the same file, as another worker would have.
+            versions.clear()
+            assert _status(client, "/api/todos", etag) == 304
+        finally:
+            app.config.update(TESTING=True, VERSION_CACHE_URL="memory://")
+            versions.clear()
@@ -0,0 +1,149 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import MemoryCache, cache_from_url
+
+VERSION_TTL = 3600  # bounds how long a lost bump could leave an ETag valid
+
+
+def _token():
+    return os.urandom(6).hex()
+
+
+class VersionStamps:
+    """Version stamps that let read endpoints answer ``If-None-Match``.
+
+    Every tracked table has a stamp, and a table tracked ``per_user`` has
+    one stamp per owner as well. Once a transaction commits, a random new
+    token replaces the stamps it touched. ORM flushes give the owners'
+    stamps, and bulk or Core statements replace the whole table's. A
+    view wrapped in :meth:`conditional` hashes the stamps it depends on
+    into an ETag. When the client already has that ETag, the view answers
+    304 without touching its rows.
+
+    Stamps live in the ``VERSION_CACHE_URL`` backend. Like the feed cache,
+    it has to be shared (sqlite:// or redis://) when there is more than one
+    worker: a worker whose stamps miss another's commit would answer 304
+    with stale data. memory:// stamps are therefore used only when
+    ``TESTING`` is set; otherwise views always answer in full. A missing
+    stamp gets a fresh token, so eviction only costs a full response.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._backend = MemoryCache()
+        self._tables = {}  # table name -> tracked per user?
+        self._listening = False
+
+    def init_app(self, app):
+        self._app = app
+        self._backend = cache_from_url(app.config["VERSION_CACHE_URL"])
+        app.extensions["versions"] = self
+        if not self._listening:
+            event.listen(Session, "after_flush", self._after_flush)
+            event.listen(Session, "do_orm_execute", self._do_orm_execute)
+            event.listen(Session, "after_commit", self._after_commit)
+            self._listening = True
+
+    def clear(self):
+        """Forget every stamp (memory backend only)."""
+        self._backend = cache_from_url(self._app.config["VERSION_CACHE_URL"])
+
+    @property
+    def shared(self):
+        """Whether every worker sees the same stamps (always, when testing)."""
+        return not isinstance(self._backend, MemoryCache) or self._app.testing
+
+    def track(self, model, per_user=False):
+        self._tables[model.__tablename__] = per_user
+
+    def stamps(self, keys):
+        tokens = []
+        for key in keys:
+            token = self._backend.get(key)
+            if token is None:
+                token = _token()
+                if not self._backend.add(key, token, VERSION_TTL):
+                    token = self._backend.get(key) or token
+            tokens.append(token)
+        return tokens
+
+    def bump(self, *keys):
+        for key in keys:
+            self._backend.set(key, _token(), VERSION_TTL)
+
+    def keys(self, models, user_id=None):
+        keys = []
+        for model in models:
+            table = model.__tablename__
+            keys.append(f"version:{table}")
+            if self._tables.get(table):
+                keys.append(f"version:{table}:{user_id}")
+        return keys
+
+    def conditional(self, *models, per_user=False, extra=None):
+        """Decorate a GET view whose 200 response depends only on the URL,
+        the rows of ``models`` (only the current user's rows, with
+        ``per_user``) and ``extra()``, if given."""
+        for model in models:
+            self.track(model, per_user)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.shared:
+                    return view(*args, **kwargs)
+                user_id = current_user.get_id() if per_user else None
+                parts = [request.full_path, user_id,
+                         *self.stamps(self.keys(models, user_id))]
+                if extra is not None:
+                    parts.append(extra())
+                etag = etag_for(*parts)
+                cache_control = "private, no-cache" if per_user else "no-cache"
+                if request.if_none_match.contains(etag):
+                    return "", 304, {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+                resp = current_app.make_response(view(*args, **kwargs))
+                if resp.status_code == 200:
+                    resp.set_etag(etag)
+                    resp.headers["Cache-Control"] = cache_control
+                return resp
+            return wrapper
+        return decorator
+
+    def _after_flush(self, session, flush_context):
+        changed = session.info.setdefault("versions_changed", set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            table = getattr(obj, "__tablename__", None)
+            if self._tables.get(table):
+                changed.add(f"version:{table}:{obj.user_id}")
+            elif table in self._tables:
+                changed.add(f"version:{table}")
+
+    def _do_orm_execute(self, state):
+        if state.is_insert or state.is_update or state.is_delete:
+            # There's no telling whose rows a bulk statement touched.
+            table = state.statement.table.name
+            if table in self._tables:
+                state.session.info.setdefault("versions_changed", set()).add(
+                    f"version:{table}"
+                )
+
+    def _after_commit(self, session):
+        # Marks left by a rollback ride along with the next commit; an
+        # extra bump only costs a full response.
+        changed = session.info.pop("versions_changed", None)
+        if changed:
+            self.bump(*changed)
+
+
+def etag_for(*parts):
+    return hashlib.sha1("\0".join(map(str, parts)).encode()).hexdigest()[:20]
+
+
+versions = VersionStamps()